@@ -31,6 +31,7 @@ if "should_generate_response" not in st.session_state:
 
 # Handle form submission and generate response
 # Add this code AFTER display chat message code block and BEFORE user_input = st.chat_input("Your message:")
+# Requires this import at the top of your app: from chat_factory import start_chat, generation_config
 # Handle form submission and generate response
 if st.session_state.should_generate_response:
     # Create combined prompt from responses
@@ -51,17 +52,6 @@ if st.session_state.should_generate_response:
 
         # Initialize chat session if needed
         if st.session_state.chat_session is None:
-            generation_config = {
-                "temperature": st.session_state.temperature,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-            }
-            model = genai.GenerativeModel(
-                model_name=st.session_state.model_name,
-                generation_config=generation_config,
-            )
-            
             initial_messages = [
                 {"role": "user", "parts": [f"System: {system_prompt}"]},
                 {"role": "model", "parts": ["Understood. I will follow these instructions."]},
@@ -73,7 +63,12 @@ if st.session_state.should_generate_response:
                     {"role": "model", "parts": ["I have received and will consider the PDF content in our conversation."]}
                 ])
             
-            st.session_state.chat_session = model.start_chat(history=initial_messages)
+            # Pooled model shared by every session (see chat_factory.py)
+            st.session_state.chat_session = start_chat(
+                st.session_state.model_name,
+                generation_config(st.session_state.temperature, max_output_tokens=8192),
+                initial_messages,
+            )
 
         # Generate response with error handling
         try:
@@ -1,6 +1,7 @@
 # Add Three Preset Buttons in Your Chat Window
 
 # Paste directly ABOVE #display chat messages and AFTER system_prompt = load_text_file('instructions.txt')
+# Requires this import at the top of your app: from chat_factory import start_chat, generation_config
 
 # Create a container for the buttons - MOVED UP before chat messages display
 button_container = st.container()
@@ -38,17 +39,6 @@ with button_container:
             
             # Use the same initialization logic as the chat input
             if st.session_state.chat_session is None:
-                generation_config = {
-                    "temperature": st.session_state.temperature,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "max_output_tokens": 8192,
-                }
-                model = genai.GenerativeModel(
-                    model_name=st.session_state.model_name,
-                    generation_config=generation_config,
-                )
-                
                 initial_messages = [
                     {"role": "user", "parts": [f"System: {system_prompt}"]},
                     {"role": "model", "parts": ["Understood. I will follow these instructions."]},
@@ -60,7 +50,12 @@ with button_container:
                         {"role": "model", "parts": ["I have received and will consider the PDF content in our conversation."]}
                     ])
                 
-                st.session_state.chat_session = model.start_chat(history=initial_messages)
+                # Pooled model shared by every session (see chat_factory.py)
+                st.session_state.chat_session = start_chat(
+                    st.session_state.model_name,
+                    generation_config(st.session_state.temperature, max_output_tokens=8192),
+                    initial_messages,
+                )
             
             try:
                 response = st.session_state.chat_session.send_message(prompt)
@@ -0,0 +1,66 @@
+# Process-level cache for static assets read on every Streamlit rerun
+#
+# The header image and instructions.txt are loaded once per process and
+# reloaded only when the file's mtime/size changes; the image is served as a
+# pre-resized, encoded buffer.
+import io
+import os
+import threading
+
+from lazy_imports import timed_import
+
+_lock = threading.Lock()
+_entries = {}   # (kind, path, extra) -> ((mtime, size), value)
+
+
+def _cached(kind: str, path: str, extra, loader):
+    st_result = os.stat(path)
+    version = (st_result.st_mtime, st_result.st_size)
+    key = (kind, os.path.abspath(path), extra)
+    entry = _entries.get(key)
+    if entry and entry[0] == version:
+        return entry[1]
+    with _lock:
+        entry = _entries.get(key)
+        if entry and entry[0] == version:
+            return entry[1]
+        value = loader()
+        _entries[key] = (version, value)
+        return value
+
+
+def load_text(path: str, encoding: str = "utf-8") -> str:
+    """
+    File contents, read from disk only when the file changed.
+    """
+    def loader():
+        with open(path, "r", encoding=encoding) as f:
+            return f.read()
+    return _cached("text", path, encoding, loader)
+
+
+def image_bytes(path: str, max_width: int = None) -> bytes:
+    """
+    Encoded image bytes, decoded and (if wider than `max_width`) downscaled
+    once per file version. Pass the result straight to st.image.
+    """
+    def loader():
+        Image = timed_import("PIL.Image")
+
+        with Image.open(path) as image:
+            fmt = image.format or "PNG"
+            if max_width and image.width > max_width:
+                height = round(image.height * max_width / image.width)
+                image = image.resize((max_width, height), Image.LANCZOS)
+            if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            save_kwargs = {"quality": 90, "optimize": True} if fmt == "JPEG" else {"optimize": True}
+            image.save(buffer, format=fmt, **save_kwargs)
+        return buffer.getvalue()
+    return _cached("image", path, max_width, loader)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
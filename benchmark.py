@@ -0,0 +1,316 @@
+# Offline benchmark of streamlit_app.py with local Gemini and Firestore stand-ins
+#
+# Drives the app's flows (password gate, preload, form submit, chat input,
+# clear chat) headlessly with Streamlit's AppTest, one AppTest per simulated
+# session. The model (chat_factory.start_chat) and the Firestore document
+# reference (firestore_client.chat_document) are replaced by fakes with
+# configurable latency, so no Google API is called. Reports reruns/sec,
+# per-turn p50/p95 latency, bytes sent per turn and memory per session while
+# the number of sessions and the conversation length grow. Script runs are
+# counted as they happen (st.rerun() included).
+#
+#   python benchmark.py --sessions 1,5,10 --turns 2,6 --match-mode model
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import chat_factory
+import firestore_client
+import firestore_writer
+from form_fields import FORM_FIELDS, PLACEHOLDER
+from metrics import percentile
+from rate_limiter import get_limiter
+from response_cache import get_response_cache
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+PASSWORD = "benchmark"
+
+FAKE_REPLY = (
+    "based on the information you have provided, you might consider taking a closer look at "
+    "these interventions from your intervention grid:\n\n# Tier 2 Interventions\n"
+    "| Intervention | Description |\n|--------------|-------------|\n"
+    "| Check-In/Check-Out (CICO) | Daily check-in and check-out with a mentor. |\n\n"
+    "# Tier 3 Interventions\nThere are no Tier 3 interventions that fit the description of this group."
+)
+
+
+###########
+# Fakes   #
+###########
+class Traffic:
+    """
+    Bytes the app would have sent upstream, shared by all fakes, and the
+    number of script runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.model_bytes = 0
+        self.model_calls = 0
+        self.firestore_bytes = 0
+        self.firestore_writes = 0
+        self.script_runs = 0
+
+    def add_model(self, n: int):
+        with self._lock:
+            self.model_bytes += n
+            self.model_calls += 1
+
+    def add_firestore(self, n: int):
+        with self._lock:
+            self.firestore_bytes += n
+            self.firestore_writes += 1
+
+    def add_run(self):
+        with self._lock:
+            self.script_runs += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"model_bytes": self.model_bytes, "model_calls": self.model_calls,
+                    "firestore_bytes": self.firestore_bytes, "firestore_writes": self.firestore_writes,
+                    "script_runs": self.script_runs}
+
+
+def _entry_text(entry) -> str:
+    parts = entry.get("parts", []) if isinstance(entry, dict) else getattr(entry, "parts", [])
+    return "\n".join(p if isinstance(p, str) else getattr(p, "text", "") for p in parts)
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChatSession:
+    """
+    Stand-in for a Gemini ChatSession: resends its whole history on every
+    message (counted as bytes sent) and replies after a configurable delay.
+    """
+
+    def __init__(self, history, traffic, ttft, per_chunk, reply, chunks):
+        self.history = list(history)
+        self.traffic = traffic
+        self.ttft = ttft
+        self.per_chunk = per_chunk
+        self.reply = reply
+        self.chunks = chunks
+
+    def send_message(self, parts, stream=False):
+        parts = parts if isinstance(parts, list) else [parts]
+        payload = {"history": [_entry_text(e) for e in self.history],
+                   "parts": [p if isinstance(p, str) else repr(p) for p in parts]}
+        self.traffic.add_model(len(json.dumps(payload).encode("utf-8")))
+        self.history = self.history + [
+            {"role": "user", "parts": payload["parts"]},
+            {"role": "model", "parts": [self.reply]},
+        ]
+        size = max(1, len(self.reply) // self.chunks)
+        pieces = [self.reply[i:i + size] for i in range(0, len(self.reply), size)]
+        if not stream:
+            time.sleep(self.ttft + self.per_chunk * len(pieces))
+            return _Chunk(self.reply)
+
+        def generate():
+            time.sleep(self.ttft)
+            for piece in pieces:
+                yield _Chunk(piece)
+                time.sleep(self.per_chunk)
+        return generate()
+
+
+class FakeDocRef:
+    def __init__(self, session_id, traffic, latency):
+        self.path = f"{firestore_client.COLLECTION}/{session_id}"
+        self.traffic = traffic
+        self.latency = latency
+
+    def set(self, data, merge=False):
+        time.sleep(self.latency)
+        self.traffic.add_firestore(len(json.dumps(data, default=str).encode("utf-8")))
+
+
+def install_fakes(traffic: Traffic, ttft: float, per_chunk: float, firestore_latency: float,
+                  rpm: float, reply: str = FAKE_REPLY, chunks: int = 8):
+    """
+    Replace the model and Firestore entry points the app imports, count
+    script runs (the app calls st.set_page_config first thing on every run),
+    and set the shared rate limiter to `rpm` requests per minute for every model.
+    """
+    import streamlit as st
+
+    def start_chat(model_name, config, history):
+        return FakeChatSession(history, traffic, ttft, per_chunk, reply, chunks)
+
+    def chat_document(session_id, service_account=None):
+        return FakeDocRef(session_id, traffic, firestore_latency)
+
+    chat_factory.start_chat = start_chat
+    firestore_client.chat_document = chat_document
+    # The writer binds array_union when it is built, so patch the instance
+    firestore_writer.get_writer().array_union = lambda values: list(values)
+
+    set_page_config = st.set_page_config
+
+    def counting_set_page_config(*args, **kwargs):
+        traffic.add_run()
+        return set_page_config(*args, **kwargs)
+    st.set_page_config = counting_set_page_config
+
+    limiter = get_limiter()
+    limiter.limits.clear()
+    limiter.default_rpm = rpm
+
+
+#################
+# Session flows #
+#################
+def new_session(match_mode: str, cache_dir: str, timeout: float):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    at.secrets["APP_PASSWORD"] = PASSWORD
+    at.secrets["GOOGLE_API_KEY"] = "offline"
+    at.secrets["GRID_MATCH_MODE"] = match_mode
+    at.secrets["RESPONSE_CACHE_PATH"] = os.path.join(cache_dir, "responses.sqlite3")
+    at.secrets["METRICS_PATH"] = os.path.join(cache_dir, "metrics.json")
+    return at
+
+
+def _button(at, label):
+    for button in at.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"No button labelled {label!r}")
+
+
+def unlock(at):
+    at.run()
+    at.text_input(key="__app_pw__").input(PASSWORD)
+    _button(at, "Unlock").click()
+    at.run()
+
+
+def submit_form(at, rng: random.Random):
+    for key, _label, options in FORM_FIELDS:
+        at.selectbox(key=key).select(rng.choice([o for o in options if o != PLACEHOLDER]))
+    _button(at, "Submit Responses").click()
+    at.run()
+
+
+def send_chat(at, text: str):
+    at.chat_input[0].set_value(text)
+    at.run()
+
+
+def clear_chat(at):
+    _button(at, "Clear Chat").click()
+    at.run()
+
+
+##############
+# Benchmarks #
+##############
+def run_scenario(sessions: int, turns: int, args, traffic: Traffic, cache_dir: str) -> dict:
+    rng = random.Random(args.seed)
+    # Every scenario starts cold (the cache lives in the benchmark's temp dir)
+    get_response_cache(os.path.join(cache_dir, "responses.sqlite3")).clear()
+    turn_ms = []
+    errors = 0
+
+    if args.memory:
+        tracemalloc.start()
+        memory_base = tracemalloc.get_traced_memory()[0]
+    traffic_before = traffic.snapshot()
+    started = time.perf_counter()
+
+    apps = []
+    for _ in range(sessions):
+        at = new_session(args.match_mode, cache_dir, args.timeout)
+        unlock(at)
+        apps.append(at)
+
+    for turn in range(turns):
+        for at in apps:
+            turn_started = time.perf_counter()
+            if turn % 2 == 0:
+                submit_form(at, rng)
+            else:
+                send_chat(at, f"What progress monitoring fits intervention number {turn}?")
+            turn_ms.append((time.perf_counter() - turn_started) * 1000)
+            errors += len(at.exception)
+
+    memory_per_session = None
+    if args.memory:
+        memory_per_session = (tracemalloc.get_traced_memory()[0] - memory_base) / sessions
+        tracemalloc.stop()
+    for at in apps:
+        clear_chat(at)
+    elapsed = time.perf_counter() - started
+    firestore_writer.get_writer().flush(timeout=30)
+
+    traffic_after = traffic.snapshot()
+    turn_ms.sort()
+    total_turns = sessions * turns
+    return {
+        "sessions": sessions,
+        "turns": turns,
+        "reruns_per_s": round((traffic_after["script_runs"] - traffic_before["script_runs"]) / elapsed, 2),
+        "turn_p50_ms": round(percentile(turn_ms, 50), 1),
+        "turn_p95_ms": round(percentile(turn_ms, 95), 1),
+        "model_calls": traffic_after["model_calls"] - traffic_before["model_calls"],
+        "model_bytes_per_turn": round((traffic_after["model_bytes"] - traffic_before["model_bytes"]) / total_turns),
+        "firestore_bytes_per_turn": round(
+            (traffic_after["firestore_bytes"] - traffic_before["firestore_bytes"]) / total_turns),
+        "memory_per_session_kb": round(memory_per_session / 1024, 1) if memory_per_session is not None else "-",
+        "errors": errors,
+    }
+
+
+def _int_list(text: str) -> list:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for streamlit_app.py")
+    parser.add_argument("--sessions", type=_int_list, default=[1, 5, 10], help="comma-separated session counts")
+    parser.add_argument("--turns", type=_int_list, default=[2, 6], help="comma-separated turns per session")
+    parser.add_argument("--match-mode", default="model", choices=["local", "prefilter", "model"])
+    parser.add_argument("--ttft", type=float, default=0.05, help="fake model time to first token (s)")
+    parser.add_argument("--per-chunk", type=float, default=0.005, help="fake model delay per streamed chunk (s)")
+    parser.add_argument("--firestore-latency", type=float, default=0.02, help="fake Firestore write latency (s)")
+    parser.add_argument("--rpm", type=float, default=100000, help="rate limit per model (requests/minute)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip tracemalloc (it slows every run down; compare timings with it off)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="AppTest timeout per script run (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    traffic = Traffic()
+    cache_dir = tempfile.mkdtemp(prefix="bench-")
+    install_fakes(traffic, args.ttft, args.per_chunk, args.firestore_latency, args.rpm)
+
+    results = []
+    columns = ["sessions", "turns", "reruns_per_s", "turn_p50_ms", "turn_p95_ms", "model_calls",
+               "model_bytes_per_turn", "firestore_bytes_per_turn", "memory_per_session_kb", "errors"]
+    print(" ".join(f"{c:>14}" for c in columns))
+    for sessions in args.sessions:
+        for turns in args.turns:
+            result = run_scenario(sessions, turns, args, traffic, cache_dir)
+            results.append(result)
+            print(" ".join(f"{result[c]:>14}" for c in columns), flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "json_path"},
+                       "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
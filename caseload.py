@@ -0,0 +1,163 @@
+# Batch ("caseload") evaluation of many student profiles
+#
+# After an SRSS-IE screening window an interventionist wants the whole class
+# checked, not one sidebar submission (and one chat turn) per student. A CSV
+# of de-identified profiles in the six form fields is read, identical
+# profiles are evaluated once, and results stream back as they complete.
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from form_fields import FORM_FIELDS, FORM_KEYS, PLACEHOLDER
+
+# Columns that identify a row (kept in the results, never sent anywhere)
+ID_COLUMNS = ("student_id", "student", "id", "name")
+
+DEFAULT_WORKERS = 4
+
+_NUMBER_RE = re.compile(r"^\s*(\d+)\s*$")
+_BAND_RE = re.compile(r"(\d+)\s*(?:-\s*(\d+)|\+)")
+
+
+def _normalize_header(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower().rstrip(":")).strip("_")
+
+
+# Accepted header spellings -> form key (session key or the form's label)
+_HEADER_ALIASES = {}
+for _key, _label, _options in FORM_FIELDS:
+    _HEADER_ALIASES[_normalize_header(_key)] = _key
+    _HEADER_ALIASES[_normalize_header(_label)] = _key
+
+
+def _match_option(value: str, options: list):
+    """
+    The form option `value` stands for: case-insensitive match, or a bare
+    number placed in its band ("3" -> "2-3 referrals"). None if no option fits.
+    """
+    value = value.strip()
+    for option in options:
+        if option.lower() == value.lower():
+            return option
+    number = _NUMBER_RE.match(value)
+    if number:
+        n = int(number.group(1))
+        for option in options:
+            band = _BAND_RE.search(option)
+            if band and int(band.group(1)) <= n and (band.group(2) is None or n <= int(band.group(2))):
+                return option
+    return None
+
+
+def read_profiles(data: bytes):
+    """
+    Profiles from a caseload CSV: ([{"row_id", "profile": {form key: option}}], [problem, ...]).
+    Unknown or blank values are left unanswered and reported.
+    """
+    text = data.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {}
+    id_column = None
+    for header in reader.fieldnames or []:
+        normalized = _normalize_header(header)
+        if normalized in _HEADER_ALIASES:
+            columns[_HEADER_ALIASES[normalized]] = header
+        elif id_column is None and normalized in ID_COLUMNS:
+            id_column = header
+    missing = [key for key in FORM_KEYS if key not in columns]
+    if len(missing) == len(FORM_KEYS):
+        raise ValueError("No form columns found; expected headers such as " + ", ".join(FORM_KEYS))
+
+    options = {key: opts for key, _label, opts in FORM_FIELDS}
+    profiles, problems = [], []
+    if missing:
+        problems.append("Missing columns (left unanswered): " + ", ".join(missing))
+    for number, row in enumerate(reader, start=1):
+        row_id = (row.get(id_column) or "").strip() if id_column else ""
+        profile = {}
+        for key in FORM_KEYS:
+            raw = (row.get(columns[key]) or "") if key in columns else ""
+            option = _match_option(raw, options[key]) if raw.strip() else None
+            if option is None:
+                if raw.strip():
+                    problems.append(f"Row {number}: '{raw}' is not an option for {key}")
+                option = PLACEHOLDER
+            profile[key] = option
+        profiles.append({"row_id": row_id or str(number), "profile": profile})
+    return profiles, problems
+
+
+def profile_key(profile: dict) -> tuple:
+    return tuple(profile.get(key, PLACEHOLDER) for key in FORM_KEYS)
+
+
+def dedupe(profiles: list) -> dict:
+    """
+    {profile_key: profile} for the distinct profiles, in first-seen order.
+    """
+    unique = {}
+    for entry in profiles:
+        unique.setdefault(profile_key(entry["profile"]), entry["profile"])
+    return unique
+
+
+def evaluate_profiles(unique: dict, evaluate, max_workers: int = DEFAULT_WORKERS):
+    """
+    Yield (profile_key, result, error) as each distinct profile finishes.
+    `evaluate(profile)` returns {tier: [support_name, ...]}. With
+    max_workers=0 profiles are evaluated in turn on the calling thread (for
+    the local matcher, which needs no concurrency).
+    """
+    if max_workers == 0:
+        for key, profile in unique.items():
+            try:
+                yield key, evaluate(profile), None
+            except Exception as e:
+                yield key, None, e
+        return
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="caseload")
+    futures = {}
+    try:
+        futures = {executor.submit(evaluate, profile): key for key, profile in unique.items()}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+    finally:
+        # Closed early (e.g. a Streamlit rerun): drop the queued profiles and
+        # return without waiting for the requests already running
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def result_rows(profiles: list, results: dict, errors: dict = None) -> list:
+    """
+    One output row per input row (duplicates share their profile's result);
+    profiles still being evaluated show as pending.
+    """
+    errors = errors or {}
+    rows = []
+    for entry in profiles:
+        key = profile_key(entry["profile"])
+        row = {"student_id": entry["row_id"]}
+        row.update(entry["profile"])
+        if key in results:
+            row["tier2_interventions"] = "; ".join(results[key].get(2, [])) or "None"
+            row["tier3_interventions"] = "; ".join(results[key].get(3, [])) or "None"
+        else:
+            status = f"Error: {errors[key]}" if key in errors else "Pending"
+            row["tier2_interventions"] = row["tier3_interventions"] = status
+        rows.append(row)
+    return rows
+
+
+def rows_to_csv(rows: list) -> bytes:
+    buffer = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
@@ -0,0 +1,85 @@
+# Shared chat-session factory
+#
+# GenerativeModels are pooled per (model_name, generation_config) for the
+# whole process, and chat sessions are started from a prebuilt initial history.
+import threading
+
+from lazy_imports import LazyModule
+
+# Imported on first model construction, not at app start (see lazy_imports.py)
+genai = LazyModule("google.generativeai")
+
+# Sampling settings every entry point shares; only temperature and the
+# output cap vary
+GENERATION_DEFAULTS = {
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 4096,
+}
+
+_models = {}
+_models_lock = threading.Lock()
+_api_key = None
+_configured_key = None
+
+
+def configure(api_key: str):
+    """
+    Remember the API key; genai.configure runs when the first model is built.
+    """
+    global _api_key
+    _api_key = api_key
+
+
+def generation_config(temperature: float, **overrides) -> dict:
+    config = dict(GENERATION_DEFAULTS, temperature=temperature)
+    config.update(overrides)
+    return config
+
+
+def _config_key(config: dict) -> tuple:
+    return tuple(sorted(config.items()))
+
+
+def _configure_sdk():
+    global _configured_key
+    if _api_key is not None and _api_key != _configured_key:
+        genai.configure(api_key=_api_key)
+        _configured_key = _api_key
+
+
+def configured_genai():
+    """
+    The SDK module, configured with the API key (for calls outside a model,
+    e.g. genai.upload_file).
+    """
+    with _models_lock:
+        _configure_sdk()
+    return genai
+
+
+def get_model(model_name: str, config: dict):
+    """
+    Process-wide GenerativeModel for this name + generation config.
+    """
+    key = (model_name, _config_key(config))
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                _configure_sdk()
+                model = genai.GenerativeModel(model_name=model_name, generation_config=dict(config))
+                _models[key] = model
+    return model
+
+
+def start_chat(model_name: str, config: dict, history: list):
+    """
+    New chat session on the pooled model, seeded with `history`.
+    """
+    return get_model(model_name, config).start_chat(history=history)
+
+
+def pool_size() -> int:
+    return len(_models)
@@ -0,0 +1,85 @@
+# Incremental conversation log for Firestore payloads
+#
+# Holds the turns not yet handed to the Firestore writer plus a window of the
+# newest saved ones. The full chat is stored in the document's `turns` array;
+# the `transcript` and `exchanges` fields are built from the window.
+import datetime
+
+# Saved turns kept for the transcript/exchanges fields
+TRANSCRIPT_MAX_TURNS = 200
+
+
+def _transcript_line(turn: dict) -> str:
+    return f"{turn['role']}: " + turn["content"].replace("\r", " ").replace("\n", " ").strip()
+
+
+def _pair_exchanges(turns) -> list:
+    """
+    user->assistant pairs, in order; unpaired turns get None on the other side.
+    """
+    exchanges = []
+    current = None   # exchange still waiting for its assistant reply
+    for turn in turns:
+        role, text = turn["role"], turn["content"]
+        if role == "user":
+            current = {"user": text, "assistant": None}
+            exchanges.append(current)
+        elif role == "assistant":
+            if current is not None and current["assistant"] is None:
+                current["assistant"] = text
+            else:
+                exchanges.append({"user": None, "assistant": text})
+        else:
+            exchanges.append({"user": None, "assistant": None})
+    return exchanges
+
+
+class ConversationLog:
+    def __init__(self, messages: list = None, max_saved: int = TRANSCRIPT_MAX_TURNS):
+        self.max_saved = max_saved
+        self._turns = []   # {"i", "role", "content"}: the window, then the unsaved turns
+        self._count = 0    # turns appended so far
+        self._saved = 0    # turns handed to the writer so far
+        for m in messages or []:
+            self.append(m)
+
+    def __len__(self):
+        return self._count
+
+    def append(self, message: dict):
+        self._count += 1
+        self._turns.append({
+            "i": self._count,
+            "role": message.get("role", "unknown"),
+            "content": str(message.get("content", "")),
+        })
+
+    def unsaved(self) -> list:
+        """
+        Turns not yet handed to the writer (for append-only writes).
+        """
+        return self._turns[len(self._turns) - (self._count - self._saved):]
+
+    def mark_saved(self):
+        """
+        Everything appended so far has been queued; only the newest
+        `max_saved` turns are kept for the transcript.
+        """
+        self._saved = self._count
+        excess = len(self._turns) - self.max_saved
+        if excess > 0:
+            del self._turns[:excess]
+
+    # ---- payload views ----
+    def snapshot(self):
+        """
+        Frozen view for building the full-text fields on another thread.
+        Turns are never modified, so a shallow copy of the list is enough.
+        """
+        turns = list(self._turns)
+
+        def build() -> dict:
+            ts = datetime.datetime.utcnow().isoformat() + "Z"
+            transcript = " ".join([f"[transcript_saved_at_utc={ts}]"] + [_transcript_line(t) for t in turns])
+            return {"transcript": transcript, "exchanges": _pair_exchanges(turns)}
+        return build
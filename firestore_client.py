@@ -0,0 +1,73 @@
+# One Firebase app and Firestore client per process
+#
+# The client is created lazily, once, under a lock; sessions borrow it and
+# keep only their own document reference, so all of them share one pool of
+# gRPC channels.
+import threading
+import time
+
+from lazy_imports import timed_import
+
+# Collection name: "chat_sessions" (change if you like)
+COLLECTION = "chat_sessions"
+
+# After a failed setup (e.g. Firebase not configured), wait this long before
+# trying again instead of retrying on every rerun
+RETRY_AFTER = 300.0
+
+_lock = threading.Lock()
+_client = None
+_failed_at = None
+_last_error = None
+
+
+def service_account_info(raw) -> dict:
+    """
+    Service-account dict from Streamlit secrets, with escaped newlines in
+    private_key fixed if necessary.
+    """
+    sa_info = dict(raw)
+    if "private_key" in sa_info and "\\n" in sa_info["private_key"]:
+        sa_info["private_key"] = sa_info["private_key"].replace("\\n", "\n")
+    return sa_info
+
+
+def get_client(service_account: dict = None):
+    """
+    Shared Firestore client. Uses `service_account` if given, otherwise
+    Application Default Credentials (e.g. if deployed on GCP).
+    Raises if Firebase can't be set up (cached for RETRY_AFTER seconds).
+    """
+    global _client, _failed_at, _last_error
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is not None:
+            return _client
+        if _failed_at is not None and time.monotonic() - _failed_at < RETRY_AFTER:
+            raise RuntimeError(f"Firestore unavailable: {_last_error}")
+        try:
+            # Lazy import so it’s easy to remove if needed (and timed, see lazy_imports.py)
+            firebase_admin = timed_import("firebase_admin")
+            credentials = timed_import("firebase_admin.credentials")
+            fb_firestore = timed_import("firebase_admin.firestore")
+
+            if not firebase_admin._apps:
+                if service_account:
+                    firebase_admin.initialize_app(credentials.Certificate(service_account))
+                else:
+                    firebase_admin.initialize_app()
+            _client = fb_firestore.client()
+            _failed_at = None
+            return _client
+        except Exception as e:
+            _failed_at = time.monotonic()
+            _last_error = e
+            raise
+
+
+def chat_document(session_id: str, service_account: dict = None):
+    """
+    Document reference for one chat session on the shared client.
+    """
+    return get_client(service_account).collection(COLLECTION).document(session_id)
@@ -0,0 +1,226 @@
+# Write-behind persistence of chat sessions to Firestore
+#
+# One background thread per process performs the writes:
+#   - each save appends only the new turns (ArrayUnion on `turns`) with a
+#     merge write;
+#   - the full-text fields (`transcript`, `exchanges`) are built off the
+#     script thread and written at most once per `summary_interval` per
+#     document, plus on flush;
+#   - bursts for the same document are coalesced into one write;
+#   - failed writes are retried with jittered exponential backoff.
+import atexit
+import math
+import random
+import threading
+import time
+
+
+def _firestore_array_union(values):
+    from firebase_admin import firestore as fb_firestore
+    return fb_firestore.ArrayUnion(values)
+
+
+def _doc_key(doc_ref):
+    return getattr(doc_ref, "path", None) or id(doc_ref)
+
+
+class _Pending:
+    __slots__ = ("doc_ref", "fields", "turns", "summary", "force_summary", "due", "attempts")
+
+    def __init__(self, doc_ref):
+        self.doc_ref = doc_ref
+        self.fields = {}
+        self.turns = []
+        self.summary = None        # callable -> dict of full-text fields
+        self.force_summary = False
+        self.due = 0.0
+        self.attempts = 0
+
+    def absorb(self, newer: "_Pending"):
+        """
+        Fold a newer pending write for the same document into this one.
+        """
+        self.doc_ref = newer.doc_ref
+        self.fields.update(newer.fields)
+        self.turns.extend(newer.turns)
+        if newer.summary is not None:
+            self.summary = newer.summary
+        self.force_summary = self.force_summary or newer.force_summary
+        self.due = min(self.due, newer.due)
+
+
+class FirestoreWriter:
+    def __init__(self, summary_interval: float = 30.0, coalesce_delay: float = 0.25,
+                 max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 array_union=_firestore_array_union):
+        self.summary_interval = summary_interval
+        self.coalesce_delay = coalesce_delay
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.array_union = array_union
+        self._cond = threading.Condition()
+        self._pending = {}         # doc key -> _Pending
+        self._last_summary = {}    # doc key -> monotonic time of last summary write
+        self._inflight = 0
+        self._flushing = 0
+        self._thread = None
+        self._stopped = False
+        self.writes = 0
+        self.failures = 0
+        self.dropped = 0
+
+    # ---- script-thread API (never blocks on the network) ----
+    def submit(self, doc_ref, fields: dict = None, new_turns: list = None, summary=None,
+               force_summary: bool = False):
+        """
+        Queue a merge write. `summary` is a zero-argument callable returning the
+        full-text fields; it runs on the writer thread, so it must not touch
+        st.session_state (pass it a snapshot of the messages instead).
+        """
+        item = _Pending(doc_ref)
+        item.fields = dict(fields or {})
+        item.turns = list(new_turns or [])
+        item.summary = summary
+        item.force_summary = force_summary
+        item.due = time.monotonic() + self.coalesce_delay
+        with self._cond:
+            self._enqueue(item)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Write everything queued now, including pending summaries, and wait for
+        it to finish. Returns False if `timeout` ran out first.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            try:
+                while self._pending or self._inflight:
+                    for item in self._pending.values():
+                        if item.attempts == 0:
+                            item.due = 0.0
+                    self._cond.notify_all()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"queued": len(self._pending), "writes": self.writes,
+                    "failures": self.failures, "dropped": self.dropped}
+
+    # ---- internals ----
+    def _enqueue(self, item: _Pending):
+        key = _doc_key(item.doc_ref)
+        existing = self._pending.get(key)
+        if existing is None:
+            self._pending[key] = item
+        else:
+            existing.absorb(item)
+
+    def _requeue(self, item: _Pending):
+        """
+        Put back a write taken off the queue; anything queued since is newer
+        and wins over it.
+        """
+        key = _doc_key(item.doc_ref)
+        newer = self._pending.pop(key, None)
+        if newer is not None:
+            item.absorb(newer)
+        self._pending[key] = item
+        self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    ready = [k for k, p in self._pending.items() if p.due <= now]
+                    if ready or (self._stopped and not self._pending):
+                        break
+                    next_due = min((p.due for p in self._pending.values()), default=None)
+                    self._cond.wait(None if next_due is None else max(0.0, next_due - now))
+                if not ready:
+                    return
+                batch = [self._pending.pop(k) for k in ready]
+                self._inflight += len(batch)
+            for item in batch:
+                try:
+                    self._write(item)
+                finally:
+                    with self._cond:
+                        self._inflight -= 1
+                        self._cond.notify_all()
+
+    def _write(self, item: _Pending):
+        key = _doc_key(item.doc_ref)
+        now = time.monotonic()
+        summary_due = self._last_summary.get(key, -math.inf) + self.summary_interval
+        include_summary = item.summary is not None and (
+            item.force_summary or self._flushing or now >= summary_due)
+
+        payload = dict(item.fields)
+        if item.turns:
+            payload["turns"] = self.array_union(item.turns)
+        try:
+            if include_summary:
+                payload.update(item.summary())
+            if payload:
+                item.doc_ref.set(payload, merge=True)
+                with self._cond:
+                    self.writes += 1
+        except Exception:
+            with self._cond:
+                self.failures += 1
+                item.attempts += 1
+                if item.attempts >= self.max_attempts:
+                    self.dropped += 1
+                    return
+                delay = min(self.max_delay, self.base_delay * 2 ** (item.attempts - 1))
+                item.due = time.monotonic() + delay * random.uniform(0.5, 1.5)
+                self._requeue(item)
+            return
+
+        with self._cond:
+            if include_summary and item.force_summary:
+                # Final write for this document (e.g. chat cleared)
+                self._last_summary.pop(key, None)
+            elif include_summary:
+                self._last_summary[key] = now
+            elif item.summary is not None:
+                # Written the turns; the full-text fields follow once the interval passes
+                later = _Pending(item.doc_ref)
+                later.summary = item.summary
+                later.due = summary_due
+                self._requeue(later)
+
+    def close(self, timeout: float = 10.0):
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> FirestoreWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = FirestoreWriter()
+            atexit.register(_writer.close)
+        return _writer
@@ -0,0 +1,24 @@
+# Student Information form fields (the "user_form" sidebar form)
+#
+# Kept outside streamlit_app.py so offline tools (lookup_table.py) enumerate
+# exactly the options the form offers.
+
+PLACEHOLDER = "Click to select"
+
+# (session key, label, options) in the order the form shows them
+FORM_FIELDS = [
+    ("Academic_read", "Reading Performance:",
+     [PLACEHOLDER, "below average", "average", "above average"]),
+    ("Academic_math", "Math Performance:",
+     [PLACEHOLDER, "below average", "average", "above average"]),
+    ("SRSS_I", "SRSS-Internalizing Score:",
+     [PLACEHOLDER, "Low", "Moderate", "High"]),
+    ("SRSS_E", "SRSS-Externalizing Score:",
+     [PLACEHOLDER, "Low", "Moderate", "High"]),
+    ("Days_missed", "Number of Days Student has Missed:",
+     [PLACEHOLDER, "0-5 days", "6-10 days", "11-15 days", "16+ days"]),
+    ("ODRs", "Number of Office Discipline Referrals Earned:",
+     [PLACEHOLDER, "0-1 referrals", "2-3 referrals", "4-5 referrals", "6+ referrals"]),
+]
+
+FORM_KEYS = [key for key, _label, _options in FORM_FIELDS]
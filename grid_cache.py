@@ -0,0 +1,159 @@
+# Process-wide cache of parsed intervention grids
+#
+# One immutable snapshot per grid file (parsed data, prompt texts, compiled
+# entry criteria), shared by all sessions and rebuilt only when the file's
+# mtime/size changes.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from grid_matcher import CompiledGrid
+from grid_prompt import DEFAULT_VERBOSITY, VERBOSITY_LEVELS, encode_grid
+
+# How often (seconds) a cached grid re-checks its file for changes
+STAT_INTERVAL = 2.0
+
+# Unpinned grids (uploads) kept parsed at once; least recently used go first
+DEFAULT_MAX_ENTRIES = 16
+
+
+@dataclass(frozen=True)
+class GridSnapshot:
+    """
+    One parsed version of a grid file. Treat `data` as read-only: it is shared
+    by every session in the process.
+    """
+    path: str
+    mtime: float
+    size: int
+    sha256: str
+    data: dict
+    prompt_texts: dict   # verbosity -> pre-rendered prompt text
+    compiled: CompiledGrid
+
+    @property
+    def prompt_text(self) -> str:
+        return self.prompt_texts[DEFAULT_VERBOSITY]
+
+    def prompt(self, verbosity: str = DEFAULT_VERBOSITY) -> str:
+        return self.prompt_texts[verbosity]
+
+
+def grid_to_text(data: dict, verbosity: str = DEFAULT_VERBOSITY) -> str:
+    """
+    Text form of a grid sent to the model. Page-style extracts are joined;
+    anything else goes through grid_prompt.encode_grid.
+    """
+    pages = data.get("pages")
+    if isinstance(pages, list):
+        return "\n\n".join(p.get("text", "") for p in pages)
+    return encode_grid(data, verbosity)
+
+
+def build_snapshot(path: str) -> GridSnapshot:
+    """
+    Read, parse and compile a grid file.
+    """
+    st_result = os.stat(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw.decode("utf-8"))
+    if isinstance(data.get("pages"), list):
+        # Page extracts read the same at every verbosity: render once, share the string
+        text = grid_to_text(data)
+        prompt_texts = dict.fromkeys(VERBOSITY_LEVELS, text)
+    else:
+        prompt_texts = {v: grid_to_text(data, v) for v in VERBOSITY_LEVELS}
+    return GridSnapshot(
+        path=path,
+        mtime=st_result.st_mtime,
+        size=st_result.st_size,
+        sha256=hashlib.sha256(raw).hexdigest(),
+        data=data,
+        prompt_texts=prompt_texts,
+        compiled=CompiledGrid(data),
+    )
+
+
+class GridCache:
+    """
+    Thread-safe, mtime-invalidated map of path -> GridSnapshot. Pinned paths
+    (the sample grid) stay cached; the others are an LRU of `max_entries`.
+    Recency is refreshed on the locked path, i.e. at most every
+    `stat_interval` per grid.
+    """
+
+    def __init__(self, stat_interval: float = STAT_INTERVAL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.stat_interval = stat_interval
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # path -> (snapshot, last_checked)
+        self._pinned = set()
+        self.loads = 0
+        self.evictions = 0
+
+    def pin(self, path: str):
+        """
+        Never evict `path`.
+        """
+        with self._lock:
+            self._pinned.add(os.path.abspath(path))
+
+    def _store(self, path: str, snapshot: GridSnapshot, now: float):
+        self._entries[path] = (snapshot, now)
+        self._entries.move_to_end(path)
+        unpinned = [p for p in self._entries if p not in self._pinned]
+        for victim in unpinned[:max(0, len(unpinned) - self.max_entries)]:
+            del self._entries[victim]
+            self.evictions += 1
+
+    def get(self, path: str) -> GridSnapshot:
+        """
+        Shared snapshot for `path`; raises OSError/ValueError if the file is
+        missing or invalid and nothing is cached.
+        """
+        path = os.path.abspath(path)
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry and now - entry[1] < self.stat_interval:
+            return entry[0]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and now - entry[1] < self.stat_interval:
+                return entry[0]
+            snapshot = entry[0] if entry else None
+            try:
+                st_result = os.stat(path)
+            except OSError:
+                if snapshot is None:
+                    raise
+                # File vanished: keep serving the last good version
+                self._store(path, snapshot, now)
+                return snapshot
+            if (snapshot is None or snapshot.mtime != st_result.st_mtime
+                    or snapshot.size != st_result.st_size):
+                snapshot = build_snapshot(path)
+                self.loads += 1
+            self._store(path, snapshot, now)
+            return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Module-level cache: Streamlit imports this module once per process
+_cache = GridCache()
+
+
+def get_grid(path: str) -> GridSnapshot:
+    return _cache.get(path)
+
+
+def pin_grid(path: str):
+    _cache.pin(path)
@@ -0,0 +1,312 @@
+# Inverted index over the intervention grid for chat lookups
+#
+# The grid's text fields (support_name, description, reading_strategy,
+# progress_monitoring and exit_criteria) are tokenized and lightly stemmed
+# into a BM25 index once per grid version. Name and keyword questions are
+# answered locally. Questions that name interventions, or match a few of them
+# strongly, go to the model with just those records attached; anything vaguer
+# (and any question about the grid as a whole) gets the full grid.
+import math
+import re
+import threading
+
+from grid_matcher import grid_tier
+from grid_prompt import DEFAULT_VERBOSITY, encode_intervention
+
+# Field weights for ranking (a hit in the name counts most)
+FIELD_WEIGHTS = {
+    "support_name": 3.0,
+    "reading_strategy": 1.5,
+    "description": 1.0,
+    "progress_monitoring": 1.0,
+    "exit_criteria": 0.8,
+}
+
+# Field labels used in local answers
+FIELD_LABELS = {
+    "support_name": "Name",
+    "reading_strategy": "Reading strategy",
+    "description": "Description",
+    "progress_monitoring": "Progress monitoring",
+    "exit_criteria": "Exit criteria",
+}
+
+DEFAULT_TOP_K = 3
+
+# A ranked (unnamed) intervention is attached as context only with at least
+# this BM25 score and this share of the question's terms
+MIN_CONTEXT_SCORE = 3.5
+MIN_CONTEXT_COVERAGE = 0.5
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "what", "when", "which",
+    "who", "with", "about", "there", "that", "this", "these", "those", "any", "all", "please",
+    "tell", "describe", "explain", "show", "list", "intervention", "interventions", "grid",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ACRONYM_RE = re.compile(r"\(([A-Za-z][A-Za-z0-9\-]{1,9})\)")
+_SUFFIX_RE = re.compile(r"\s+(?:interventions?|for\s+\w+)\s*$", re.IGNORECASE)
+
+# "what is X", "what's X", "tell me about X", "describe X", "explain X"
+_NAME_QUESTION_RE = re.compile(
+    r"^\s*(?:what\s+is|what's|whats|what\s+are|tell\s+me\s+about|describe|explain)\s+(?:the\s+)?(.+?)\s*\??\s*$",
+    re.IGNORECASE,
+)
+# "which interventions fit ...", "what supports are Tier 3", "tier 3": need the whole grid
+_LIST_QUESTION_RE = re.compile(
+    r"\b(?:which|what|list|all)\s+(?:\w+\s+){0,2}?(?:interventions|supports)\b|\btier\s*(?:[23]|ii|iii)\b",
+    re.IGNORECASE,
+)
+# "which interventions use X", "what interventions involve X", "interventions with X"
+_KEYWORD_QUESTION_RE = re.compile(
+    r"^\s*(?:(?:which|what)\s+)?(?:interventions?|supports?)\s+"
+    r"(?:use|uses|using|involve|involves|include|includes|mention|mentions|have|has|with|for|target|targets)\s+(.+?)\s*\??\s*$",
+    re.IGNORECASE,
+)
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix stripping ("strategies" -> "strategy", "setting" -> "set",
+    "ratings" -> "rating"); short words are left alone so acronyms survive.
+    """
+    if len(word) <= 4 or word.isdigit():
+        return word
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", ""), ("ly", "")):
+        if word.endswith(suffix) and not word.endswith("ss"):
+            base = word[:-len(suffix)] + replacement
+            if suffix in ("ing", "ed") and len(base) >= 4 and base[-1] == base[-2] and base[-1] not in "lsz":
+                base = base[:-1]
+            if len(base) >= 3 if suffix in ("ing", "ed") else len(base) >= 4:
+                return base
+    return word
+
+
+def tokenize(text: str) -> list:
+    return [stem(t) for t in _TOKEN_RE.findall(str(text).lower()) if t not in _STOPWORDS]
+
+
+def _flatten(value) -> list:
+    """
+    Strings inside a field value (nested dicts / lists included), in order.
+    """
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [s for v in value.values() for s in _flatten(v)]
+    if isinstance(value, (list, tuple)):
+        return [s for v in value for s in _flatten(v)]
+    return [str(value)]
+
+
+def _one_line(text) -> str:
+    return " ".join(str(text).split())
+
+
+def _clip(text: str, limit: int = 180) -> str:
+    text = _one_line(text)
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _phrase(text: str) -> str:
+    # Lower-case words joined by single spaces, for alias matching
+    return " ".join(_TOKEN_RE.findall(str(text).lower()))
+
+
+class GridIndex:
+    """
+    BM25-ranked inverted index over one or more grid documents.
+    Build it once per grid version (it is immutable).
+    """
+
+    def __init__(self, grids: list, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []       # {"intervention", "tier", "fields": {field: [text, ...]}, "terms": set}
+        self.postings = {}   # token -> {doc id: weighted term frequency}
+        self.lengths = []
+        self.aliases = []    # (phrase, doc id), longest first
+        for data in grids:
+            default_tier = grid_tier(data)
+            for iv in data.get("interventions", []):
+                self._add(iv, iv.get("tier", default_tier))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.aliases.sort(key=lambda alias: len(alias[0]), reverse=True)
+
+    def _add(self, iv: dict, tier) -> None:
+        doc_id = len(self.docs)
+        fields = {field: _flatten(iv.get(field)) for field in FIELD_WEIGHTS}
+        terms = set()
+        self.docs.append({"intervention": iv, "tier": tier, "fields": fields, "terms": terms})
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for text in fields[field]:
+                for token in tokenize(text):
+                    terms.add(token)
+                    postings = self.postings.setdefault(token, {})
+                    postings[doc_id] = postings.get(doc_id, 0.0) + weight
+                    length += weight
+        self.lengths.append(length)
+
+        name = iv.get("support_name", "")
+        bare = _ACRONYM_RE.sub("", name)
+        # "Social Skills Intervention" is also "social skills", "SRSD for Writing" also "SRSD"
+        phrases = {_phrase(name), _phrase(bare)}
+        short = _phrase(_SUFFIX_RE.sub("", bare))
+        if len(short.split()) >= 2:
+            phrases.add(short)
+        phrases.update(_phrase(acronym) for acronym in _ACRONYM_RE.findall(name))
+        self.aliases.extend((phrase, doc_id) for phrase in phrases if phrase)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K, require_all: bool = False) -> list:
+        """
+        [(score, doc id)] best first. With require_all, only interventions
+        containing every query term are returned.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.docs:
+            return []
+        scores = {}
+        hits = {}
+        n = len(self.docs)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / (self.avg_length or 1.0))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                hits[doc_id] = hits.get(doc_id, 0) + 1
+        if require_all:
+            scores = {d: s for d, s in scores.items() if hits[d] == len(terms)}
+        ranked = sorted(((s, d) for d, s in scores.items()), reverse=True)
+        return ranked[:k] if k else ranked
+
+    def find_named(self, text: str):
+        """
+        Doc id of the intervention whose name or acronym appears in `text`.
+        """
+        named = self.find_all_named(text)
+        return named[0] if named else None
+
+    def find_all_named(self, text: str) -> list:
+        """
+        Doc ids of every intervention named in `text`, longest name first.
+        """
+        padded = f" {_phrase(text)} "
+        return list(dict.fromkeys(doc_id for phrase, doc_id in self.aliases if f" {phrase} " in padded))
+
+    # ---- local answers ----
+    def record(self, doc_id: int, verbosity: str = DEFAULT_VERBOSITY) -> str:
+        """
+        Prompt text of one intervention: its grid_prompt encoding (entry
+        criteria included) plus the other indexed fields.
+        """
+        doc = self.docs[doc_id]
+        lines = [encode_intervention(doc["intervention"], doc["tier"], verbosity)]
+        for field in ("reading_strategy", "progress_monitoring", "exit_criteria"):
+            texts = [_one_line(t) for t in doc["fields"][field] if _one_line(t)]
+            if texts:
+                lines.append(f"{FIELD_LABELS[field]}: " + "; ".join(texts))
+        return "\n".join(lines)
+
+    def describe(self, doc_id: int) -> str:
+        doc = self.docs[doc_id]
+        fields = doc["fields"]
+        lines = [f"**{_one_line(doc['intervention'].get('support_name', ''))}** (Tier {doc['tier']})", ""]
+        for field in ("reading_strategy", "description", "progress_monitoring", "exit_criteria"):
+            texts = [_one_line(t) for t in fields[field] if _one_line(t)]
+            if texts:
+                lines.append(f"- **{FIELD_LABELS[field]}:** " + "; ".join(texts))
+        return "\n".join(lines)
+
+    def _matching_field(self, doc_id: int, terms: set):
+        for field in FIELD_WEIGHTS:
+            for text in self.docs[doc_id]["fields"][field]:
+                if terms & set(tokenize(text)):
+                    return field, text
+        return None, ""
+
+    def keyword_answer(self, keywords: str):
+        results = self.search(keywords, k=0, require_all=True)
+        if not results:
+            return None
+        terms = set(tokenize(keywords))
+        lines = [f"Interventions in your grid that mention **{_one_line(keywords)}**:", ""]
+        for _score, doc_id in results:
+            doc = self.docs[doc_id]
+            field, text = self._matching_field(doc_id, terms)
+            where = f" — {FIELD_LABELS[field].lower()}: {_clip(text)}" if field and field != "support_name" else ""
+            lines.append(f"- **{_one_line(doc['intervention'].get('support_name', ''))}** (Tier {doc['tier']}){where}")
+        return "\n".join(lines)
+
+    def answer(self, question: str):
+        """
+        Local answer for a name or keyword question, or None if the question
+        should go to the model.
+        """
+        keyword = _KEYWORD_QUESTION_RE.match(question)
+        if keyword:
+            return self.keyword_answer(keyword.group(1))
+        named = _NAME_QUESTION_RE.match(question)
+        if named:
+            doc_id = self.find_named(named.group(1))
+            # Only when the question is just the name (not "what is the exit criteria for CICO")
+            if doc_id is not None and self.find_named(question) == doc_id and len(tokenize(named.group(1))) <= 8:
+                remainder = set(tokenize(named.group(1))) - set(tokenize(self.docs[doc_id]["intervention"].get("support_name", "")))
+                if not remainder:
+                    return self.describe(doc_id)
+        return None
+
+    def confident_matches(self, question: str, k: int = DEFAULT_TOP_K) -> list:
+        """
+        Doc ids (at most k) that `question` is clearly about: the interventions
+        it names, then ranked ones scoring at least MIN_CONTEXT_SCORE and
+        containing MIN_CONTEXT_COVERAGE of its terms. Empty for questions
+        about the grid as a whole ("which interventions ...", "Tier 3").
+        """
+        if _LIST_QUESTION_RE.search(question):
+            return []
+        matches = self.find_all_named(question)
+        terms = set(tokenize(question))
+        for score, doc_id in self.search(question, k):
+            if score < MIN_CONTEXT_SCORE:
+                break
+            if len(terms & self.docs[doc_id]["terms"]) >= MIN_CONTEXT_COVERAGE * len(terms):
+                matches.append(doc_id)
+        return list(dict.fromkeys(matches))[:k]
+
+    def context_for(self, question: str, k: int = DEFAULT_TOP_K, verbosity: str = DEFAULT_VERBOSITY) -> str:
+        """
+        Records of the interventions `question` is clearly about, to attach to
+        a model request in place of the grid (empty: send the whole grid).
+        """
+        return "\n\n".join(self.record(doc_id, verbosity) for doc_id in self.confident_matches(question, k))
+
+
+# Indexes by grid versions (sha256s)
+_indexes = {}
+_indexes_lock = threading.Lock()
+_INDEXES_MAX = 16
+
+
+def get_index(snapshots: list) -> GridIndex:
+    """
+    Index over the given GridSnapshots, built once per combination of versions.
+    """
+    key = tuple(snapshot.sha256 for snapshot in snapshots)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                if len(_indexes) >= _INDEXES_MAX:
+                    _indexes.pop(next(iter(_indexes)))
+                index = GridIndex([snapshot.data for snapshot in snapshots])
+                _indexes[key] = index
+    return index
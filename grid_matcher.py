@@ -0,0 +1,344 @@
+# Local entry-criteria matcher for the intervention grid (sample_tier2.json schema)
+#
+# The grid's own `entry_criteria` (academic/behavior lists plus the `logic` string)
+# are compiled ONCE into small predicate trees. A `form_responses` dict from the
+# "user_form" sidebar form can then be checked against every intervention without
+# calling the model.
+import re
+
+# Values the sidebar selectboxes use when nothing was chosen
+UNANSWERED = {"", "Click to select", None}
+
+# Numbers written out in the grids ("Two or more office discipline referrals")
+_WORD_NUMBERS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+_SRSS_RE = re.compile(r"SRSS-?\s*(E7|I5)[^:]*:\s*(Low|Moderate|High)", re.IGNORECASE)
+# "2 or more", "Two or more", "Two of more" (typo in the grid), "2 or fewer"
+_COUNT_RE = re.compile(
+    r"\b(\d+|" + "|".join(_WORD_NUMBERS) + r")\s+o[rf]\s+(more|fewer|less)\b",
+    re.IGNORECASE,
+)
+_LEVEL_RE = re.compile(r"\b(intensive|strategic|well-below|below)\b", re.IGNORECASE)
+_SCREENER_RE = re.compile(r"\b(AIMSweb|Acadience|CBM|MAZE|STAR)\b")
+_BAND_RE = re.compile(r"(\d+)\s*(?:-\s*(\d+)|\+)")
+
+# Explicit connector tokens that appear as their own list items
+_AND = "AND"
+_OR = "OR"
+_CONNECTORS = {"AND": _AND, "OR": _OR, "AND/OR": _OR}
+_TRAILING_ANDOR_RE = re.compile(r"\s+and/or\s*$", re.IGNORECASE)
+
+
+def _to_int(token: str) -> int:
+    token = token.lower()
+    return _WORD_NUMBERS[token] if token in _WORD_NUMBERS else int(token)
+
+
+def _band_floor(answer):
+    """
+    Lower bound of a selectbox band such as "2-3 referrals" or "16+ days".
+    Bands are compared at their minimum so a student only meets
+    "2 or more" when every value in the band does.
+    """
+    if answer in UNANSWERED:
+        return None
+    m = _BAND_RE.search(str(answer))
+    return int(m.group(1)) if m else None
+
+
+def _band_ceiling(answer):
+    """
+    Upper bound of a selectbox band ("2-3 referrals" -> 3). Open-ended bands
+    ("16+ days") are unbounded, so they never meet "N or fewer".
+    """
+    if answer in UNANSWERED:
+        return None
+    m = _BAND_RE.search(str(answer))
+    if not m:
+        return None
+    return int(m.group(2)) if m.group(2) else float("inf")
+
+
+######################
+# Predicate compiler #
+######################
+# Predicates return True / False, or None when the form cannot answer them
+# (e.g. "Parent permission", "Progress report: 1 or more course failures").
+# None is neutral: it never satisfies an intervention on its own and never
+# blocks one that the screened data already supports.
+
+def _srss_atom(scale: str, band: str):
+    key = "SRSS_E" if scale.upper() == "E7" else "SRSS_I"
+    band = band.capitalize()
+
+    def check(responses):
+        answer = responses.get(key)
+        if answer in UNANSWERED:
+            return None
+        return str(answer).capitalize() == band
+    return check
+
+
+def _count_atom(key: str, n: int, at_least: bool):
+    # "N or more" needs the whole band at or above N, "N or fewer" the whole band at or below it
+    bound = _band_floor if at_least else _band_ceiling
+
+    def check(responses):
+        value = bound(responses.get(key))
+        if value is None:
+            return None
+        return value >= n if at_least else value <= n
+    return check
+
+
+def _level_atom(keys: tuple):
+    def check(responses):
+        answers = [responses.get(k) for k in keys]
+        known = [a for a in answers if a not in UNANSWERED]
+        if not known:
+            return None
+        return any(str(a).lower() == "below average" for a in known)
+    return check
+
+
+def _unscreened_atom(responses):
+    return None
+
+
+def compile_criterion(text: str):
+    """
+    Compile one entry-criteria line into a predicate over `form_responses`.
+    Returns (predicate, kind) where kind is "srss", "odr", "absences",
+    "level" or "unscreened".
+    """
+    m = _SRSS_RE.search(text)
+    if m:
+        return _srss_atom(m.group(1), m.group(2)), "srss"
+
+    lowered = text.lower()
+    count = _COUNT_RE.search(text)
+    if count:
+        n = _to_int(count.group(1))
+        at_least = count.group(2).lower() == "more"
+        if "discipline referral" in lowered or re.search(r"\bodrs?\b", lowered):
+            return _count_atom("ODRs", n, at_least), "odr"
+        if "absence" in lowered or "days missed" in lowered:
+            return _count_atom("Days_missed", n, at_least), "absences"
+
+    if _SCREENER_RE.search(text) and _LEVEL_RE.search(text):
+        keys = []
+        if "reading" in lowered:
+            keys.append("Academic_read")
+        if "math" in lowered:
+            keys.append("Academic_math")
+        if keys:
+            return _level_atom(tuple(keys)), "level"
+
+    return _unscreened_atom, "unscreened"
+
+
+def _all_of(preds):
+    def check(responses):
+        result = None
+        for p in preds:
+            value = p(responses)
+            if value is False:
+                return False
+            if value is True:
+                result = True
+        return result
+    return check
+
+
+def _any_of(preds):
+    def check(responses):
+        result = None
+        for p in preds:
+            value = p(responses)
+            if value is True:
+                return True
+            if value is False:
+                result = False
+        return result
+    return check
+
+
+def compile_section(items: list):
+    """
+    Compile a criteria list such as
+        ["SRSS-E7 score: Moderate (4-8) and/or", "SRSS-I5 score: Moderate (2-3)",
+         "AND", "Parent permission"]
+    Adjacent items (or items joined by a trailing "and/or") form an and/or
+    cluster; clusters are joined by the explicit "AND" / "OR" tokens with
+    AND binding tighter than OR.
+    """
+    if isinstance(items, str):
+        items = [items]
+
+    disjuncts = []   # list of conjunctions
+    conjunction = []  # list of clusters
+    cluster = []      # list of atoms
+
+    def close_cluster():
+        if cluster:
+            conjunction.append(_any_of(list(cluster)))
+            cluster.clear()
+
+    def close_conjunction():
+        close_cluster()
+        if conjunction:
+            disjuncts.append(_all_of(list(conjunction)))
+            conjunction.clear()
+
+    for raw in items:
+        text = str(raw).strip()
+        token = _CONNECTORS.get(text.upper())
+        if token == _AND:
+            close_cluster()
+        elif token == _OR:
+            close_conjunction()
+        elif text:
+            cluster.append(compile_criterion(_TRAILING_ANDOR_RE.sub("", text))[0])
+    close_conjunction()
+
+    if not disjuncts:
+        return _unscreened_atom
+    return disjuncts[0] if len(disjuncts) == 1 else _any_of(disjuncts)
+
+
+def _sections_joined_by_and(logic: str) -> bool:
+    """
+    Read how the academic and behavior sections combine from the `logic` string.
+    "Academic AND Behavior" -> AND; anything with AND/OR or OR -> OR.
+    """
+    logic = logic or ""
+    if re.search(r"\bAND/OR\b|\bOR\b", logic):
+        return False
+    return bool(re.search(r"\bAND\b", logic))
+
+
+def compile_entry_criteria(criteria: dict):
+    """
+    Compile an intervention's full `entry_criteria` block into one predicate.
+    """
+    criteria = criteria or {}
+    sections = [compile_section(v) for k, v in criteria.items() if k != "logic" and v]
+    if not sections:
+        return _unscreened_atom
+    if len(sections) == 1:
+        return sections[0]
+    if _sections_joined_by_and(criteria.get("logic", "")):
+        return _all_of(sections)
+    return _any_of(sections)
+
+
+def grid_tier(data: dict) -> int:
+    """
+    Tier of a grid document, read from its title ("Secondary (Tier 2) ...").
+    """
+    if str(data.get("tier", "")).strip() == "3":
+        return 3
+    title = str(data.get("document_title", "")).lower()
+    if "tier 3" in title or "tertiary" in title:
+        return 3
+    return 2
+
+
+class CompiledGrid:
+    """
+    An intervention grid with every intervention's entry criteria compiled.
+    Build it once per grid (it is immutable) and call `match()` per submission.
+    """
+
+    def __init__(self, data: dict):
+        default_tier = grid_tier(data)
+        self.interventions = []
+        for iv in data.get("interventions", []):
+            tier = iv.get("tier", default_tier)
+            self.interventions.append({
+                "support_name": iv.get("support_name", ""),
+                "description": iv.get("description", ""),
+                "tier": int(tier) if str(tier).isdigit() else default_tier,
+                "predicate": compile_entry_criteria(iv.get("entry_criteria")),
+            })
+
+    def match(self, form_responses: dict) -> list:
+        """
+        Interventions whose screened entry criteria are met, in grid order.
+        """
+        return [iv for iv in self.interventions if iv["predicate"](form_responses) is True]
+
+
+def group_by_tier(matches: list) -> dict:
+    """
+    {2: [...], 3: [...]} from a list of matched interventions.
+    """
+    tiers = {2: [], 3: []}
+    for iv in matches:
+        tiers.setdefault(iv["tier"], []).append(iv)
+    return tiers
+
+
+def compile_grids(*grids: dict) -> CompiledGrid:
+    """
+    Compile one or more grid documents (e.g. separate Tier 2 and Tier 3 grids)
+    into a single CompiledGrid.
+    """
+    compiled = CompiledGrid({})
+    for data in grids:
+        compiled.interventions.extend(CompiledGrid(data).interventions)
+    return compiled
+
+
+#########################
+# Markdown table output #
+#########################
+INTRO_SENTENCE = ("based on the information you have provided, you might consider taking "
+                  "a closer look at these interventions from your intervention grid:")
+NO_TIER3_SENTENCE = "There are no Tier 3 interventions that fit the description of this group."
+NO_TIER2_SENTENCE = "There are no Tier 2 interventions that fit the description of this group."
+
+
+def _cell(text: str) -> str:
+    # Markdown table cells cannot contain raw newlines or unescaped pipes
+    return " ".join(str(text).split()).replace("|", "\\|")
+
+
+def _table(rows: list) -> str:
+    lines = ["| Intervention | Description |", "|--------------|-------------|"]
+    for iv in rows:
+        lines.append(f"| {_cell(iv['support_name'])} | {_cell(iv['description'])} |")
+    return "\n".join(lines)
+
+
+def render_tier_tables(tiers: dict, failed: dict = None) -> str:
+    """
+    Render matches in the exact two-table format instructions.txt mandates.
+    `failed` maps a tier that could not be evaluated to the note shown in
+    place of its table.
+    """
+    failed = failed or {}
+
+    def section(tier, empty_sentence):
+        if tier in failed:
+            return failed[tier]
+        return _table(tiers.get(tier, [])) if tiers.get(tier) else empty_sentence
+
+    parts = [INTRO_SENTENCE, "", "# Tier 2 Interventions", section(2, NO_TIER2_SENTENCE)]
+    parts += ["", "# Tier 3 Interventions", section(3, NO_TIER3_SENTENCE)]
+    return "\n".join(parts)
+
+
+def candidates_to_grid(data: dict, matches: list) -> dict:
+    """
+    Copy of a grid document holding only the matched interventions, for
+    sending a pre-filtered grid to the model.
+    """
+    names = {iv["support_name"] for iv in matches}
+    filtered = {k: v for k, v in data.items() if k != "interventions"}
+    filtered["interventions"] = [iv for iv in data.get("interventions", [])
+                                 if iv.get("support_name") in names]
+    return filtered
@@ -0,0 +1,86 @@
+# Compact prompt encoding of an intervention grid
+#
+# The model only needs the fields instructions.txt actually uses: support name,
+# description, entry criteria and tier. Progress monitoring, social validity,
+# treatment integrity and exit criteria are dropped, and the JSON punctuation,
+# indentation and \u escapes are replaced with a short, stable text layout.
+import json
+import math
+
+from grid_matcher import grid_tier
+
+# Verbosity levels, smallest first
+#   "minimal" - name, tier and entry criteria (enough for lookups, not for tables)
+#   "compact" - minimal + verbatim description (default; enough for the tables)
+#   "full"    - the original pretty-printed JSON document
+VERBOSITY_LEVELS = ("minimal", "compact", "full")
+DEFAULT_VERBOSITY = "compact"
+
+# Rough characters-per-token ratio for English text on Gemini models
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def prompt_stats(text: str) -> dict:
+    """
+    Size report for a prompt fragment: {"chars": ..., "tokens_est": ...}.
+    """
+    return {"chars": len(text), "tokens_est": estimate_tokens(text)}
+
+
+def _one_line(text) -> str:
+    return " ".join(str(text).split())
+
+
+def _criteria_line(items) -> str:
+    """
+    ["A", "B", "OR", "C"] -> "A; B OR C"
+    """
+    if isinstance(items, str):
+        return _one_line(items)
+    out = ""
+    for raw in items:
+        text = _one_line(raw)
+        if text.upper() in ("AND", "OR", "AND/OR"):
+            out += f" {text.upper()} "
+        elif text:
+            out += ("; " if out and not out.endswith(" ") else "") + text
+    return out.strip()
+
+
+def encode_intervention(iv: dict, tier: int, verbosity: str = DEFAULT_VERBOSITY) -> str:
+    lines = [f"### {_one_line(iv.get('support_name', ''))} [Tier {tier}]"]
+    if verbosity != "minimal" and iv.get("description"):
+        lines.append(f"Description: {_one_line(iv['description'])}")
+    criteria = iv.get("entry_criteria") or {}
+    logic = criteria.get("logic")
+    lines.append("Entry criteria" + (f" ({_one_line(logic)}):" if logic else ":"))
+    for key, items in criteria.items():
+        if key == "logic" or not items:
+            continue
+        lines.append(f"- {key.replace('_', ' ').capitalize()}: {_criteria_line(items)}")
+    return "\n".join(lines)
+
+
+def encode_grid(data: dict, verbosity: str = DEFAULT_VERBOSITY) -> str:
+    """
+    Render a grid document (sample_tier2.json schema) as prompt text.
+    Output is deterministic for a given document and verbosity.
+    """
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity {verbosity!r}; expected one of {VERBOSITY_LEVELS}")
+    if verbosity == "full" or not isinstance(data.get("interventions"), list):
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    default_tier = grid_tier(data)
+    header = _one_line(data.get("document_title", "Intervention Grid"))
+    if data.get("source"):
+        header += f" ({_one_line(data['source'])})"
+    blocks = [f"# {header}"]
+    for iv in data["interventions"]:
+        tier = iv.get("tier", default_tier)
+        blocks.append(encode_intervention(iv, tier, verbosity))
+    return "\n\n".join(blocks)
@@ -0,0 +1,235 @@
+# Ingestion of uploaded intervention grids into a content-addressed store
+#
+# Uploaded Tier 2 / Tier 3 grids (PDF, or JSON already in the
+# sample_tier2.json schema) are normalized into the sample_tier2.json schema
+# and saved as <store>/<sha256 of the upload>.json (PDF extracts also carry
+# the page/character caps in the name). Stored files are loaded through
+# grid_cache like the sample grid.
+import hashlib
+import io
+import json
+import os
+import logging
+import re
+import threading
+import time
+
+from lazy_imports import timed_import
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = ".grid_store"
+
+# Extraction caps for very large binders (None = no cap)
+DEFAULT_MAX_PAGES = 400
+DEFAULT_MAX_CHARS = 1_500_000
+
+# Store size and age limits; the least recently ingested files go first
+DEFAULT_STORE_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_STORE_MAX_AGE = 30 * 24 * 3600
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def detect_tier(text: str, default: int = 2) -> int:
+    """
+    Tier of a grid from its text ("Tertiary (Tier 3) Intervention Grid").
+    """
+    head = text[:2000].lower()
+    if re.search(r"\btier\s*(3|iii)\b|\btertiary\b", head):
+        return 3
+    if re.search(r"\btier\s*(2|ii)\b|\bsecondary\b", head):
+        return 2
+    return default
+
+
+def open_pdf(data: bytes):
+    """
+    PyPDF2 reader over the uploaded bytes (PyPDF2 is imported on first use).
+    """
+    return timed_import("PyPDF2").PdfReader(io.BytesIO(data))
+
+
+def iter_pdf_pages(reader, max_pages: int = DEFAULT_MAX_PAGES, max_chars: int = DEFAULT_MAX_CHARS):
+    """
+    Yield (page_number, text, seconds) one PDF page at a time. Stops after
+    `max_pages` pages or once `max_chars` characters have been yielded; the
+    page crossing the cap is cut short.
+    """
+    chars = 0
+    for number, page in enumerate(reader.pages, start=1):
+        if max_pages is not None and number > max_pages:
+            return
+        started = time.perf_counter()
+        text = page.extract_text() or ""
+        elapsed = time.perf_counter() - started
+        if max_chars is not None and chars + len(text) > max_chars:
+            text = text[:max_chars - chars]
+        chars += len(text)
+        yield number, text, elapsed
+        if max_chars is not None and chars >= max_chars:
+            return
+
+
+def normalize_pdf(data: bytes, filename: str, max_pages: int = DEFAULT_MAX_PAGES,
+                  max_chars: int = DEFAULT_MAX_CHARS) -> dict:
+    """
+    sample_tier2.json-schema document for a PDF grid. The table structure is
+    not recoverable from PDF text, so the page texts are kept under "pages"
+    (sent to the model as-is) and "interventions" is left empty. Per-page
+    extraction times and whether a cap was hit are kept under "extraction".
+    """
+    reader = open_pdf(data)
+    pages = []
+    page_ms = []
+    chars = 0
+    for number, text, elapsed in iter_pdf_pages(reader, max_pages, max_chars):
+        pages.append({"page": number, "text": text})
+        page_ms.append(round(elapsed * 1000, 1))
+        chars += len(text)
+
+    page_count = len(reader.pages)
+    first_line = next((line.strip() for p in pages for line in p["text"].splitlines() if line.strip()), "")
+    extraction = {
+        "pages_read": len(pages),
+        "page_count": page_count,
+        "chars": chars,
+        "truncated": len(pages) < page_count or (max_chars is not None and chars >= max_chars),
+        "total_ms": round(sum(page_ms), 1),
+        "page_ms": page_ms,
+    }
+    logger.info("Extracted %s: %s", filename, {k: v for k, v in extraction.items() if k != "page_ms"})
+    return {
+        "document_title": first_line or os.path.splitext(filename)[0],
+        "source": filename,
+        # The tier is stated in the title block, so the first pages are enough
+        "tier": detect_tier("\n".join(p["text"] for p in pages[:2])),
+        "pages": pages,
+        "interventions": [],
+        "extraction": extraction,
+    }
+
+
+def normalize_json(data: bytes, filename: str) -> dict:
+    doc = json.loads(data.decode("utf-8"))
+    if not isinstance(doc, dict) or not isinstance(doc.get("interventions", doc.get("pages")), list):
+        raise ValueError(f"{filename} is not an intervention grid (expected an 'interventions' list)")
+    doc.setdefault("source", filename)
+    return doc
+
+
+class GridStore:
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_pages: int = DEFAULT_MAX_PAGES,
+                 max_chars: int = DEFAULT_MAX_CHARS, max_bytes: int = DEFAULT_STORE_MAX_BYTES,
+                 max_age: float = DEFAULT_STORE_MAX_AGE):
+        self.root = root
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def path_for(self, sha256: str, is_pdf: bool = False, max_pages: int = None,
+                 max_chars: int = None) -> str:
+        """
+        Stored file for an upload. PDF extracts depend on the caps (the
+        store's own unless given), so changing them re-extracts instead of
+        serving a stale truncation.
+        """
+        if is_pdf:
+            max_pages = self.max_pages if max_pages is None else max_pages
+            max_chars = self.max_chars if max_chars is None else max_chars
+            return os.path.join(self.root, f"{sha256}-p{max_pages}-c{max_chars}.json")
+        return os.path.join(self.root, f"{sha256}.json")
+
+    def ingest(self, data: bytes, filename: str, max_pages: int = None, max_chars: int = None) -> str:
+        """
+        Path of the normalized grid for an upload, converting it only if this
+        exact file has not been stored before with the same caps.
+        """
+        max_pages = self.max_pages if max_pages is None else max_pages
+        max_chars = self.max_chars if max_chars is None else max_chars
+        sha256 = file_hash(data)
+        is_pdf = not filename.lower().endswith(".json")
+        path = self.path_for(sha256, is_pdf, max_pages, max_chars)
+        if self._touch(path):
+            return path
+        with self._lock:
+            if self._touch(path):
+                return path
+            if is_pdf:
+                doc = normalize_pdf(data, filename, max_pages, max_chars)
+            else:
+                doc = normalize_json(data, filename)
+            doc["upload_sha256"] = sha256
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(doc, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._sweep(keep=path)
+            return path
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """
+        Mark a stored file as recently used; False if it is not stored.
+        """
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _sweep(self, keep: str = None):
+        """
+        Delete stored files older than `max_age`, then the least recently
+        used ones until the store fits in `max_bytes`. Sessions still holding
+        a deleted path re-ingest their upload on the next rerun.
+        """
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        files = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                st_result = os.stat(path)
+            except OSError:
+                continue
+            files.append((st_result.st_mtime, st_result.st_size, path))
+        files.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if path == keep:
+                continue
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def sweep(self):
+        with self._lock:
+            self._sweep()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(root: str = DEFAULT_STORE_DIR) -> GridStore:
+    """
+    The process's store. Extraction caps are per call: pass them to ingest().
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = GridStore(root)
+        return _store
@@ -0,0 +1,93 @@
+# Token-budgeted chat history
+#
+# A Gemini chat session resends its whole history on every turn, so long
+# advising sessions get steadily slower and more expensive and eventually hit
+# the context ceiling. HistoryManager keeps the pinned entries (system prompt
+# and grid exchange) untouched and, once the rest of the history goes over a
+# token budget, folds the oldest exchanges into one compact summary exchange.
+# The summary is built locally (no extra model call), so compaction is free.
+from grid_prompt import estimate_tokens
+
+SUMMARY_PREFIX = "Summary of earlier conversation (older turns condensed):"
+SUMMARY_ACK = "Noted. I will keep this earlier conversation in mind."
+
+
+def entry_role(entry) -> str:
+    return entry.get("role", "") if isinstance(entry, dict) else getattr(entry, "role", "")
+
+
+def entry_text(entry) -> str:
+    """
+    Text of a history entry, given either as a dict ({"role", "parts"}) or as
+    the SDK's Content object.
+    """
+    parts = entry.get("parts", []) if isinstance(entry, dict) else getattr(entry, "parts", [])
+    texts = []
+    for part in parts:
+        texts.append(part if isinstance(part, str) else getattr(part, "text", "") or "")
+    return "\n".join(texts)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class HistoryManager:
+    def __init__(self, budget_tokens: int = 12000, keep_recent: int = 6,
+                 line_chars: int = 240, summary_tokens: int = 1500):
+        """
+        budget_tokens  - estimated tokens allowed outside the pinned entries
+        keep_recent    - newest entries always kept verbatim
+        line_chars     - per-message cap inside the summary
+        summary_tokens - cap on the summary itself (oldest lines drop first)
+        """
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.line_chars = line_chars
+        self.summary_tokens = summary_tokens
+
+    def footprint(self, history: list) -> int:
+        return sum(estimate_tokens(entry_text(e)) for e in history)
+
+    def _is_summary(self, entry) -> bool:
+        return entry_role(entry) == "user" and entry_text(entry).startswith(SUMMARY_PREFIX)
+
+    def compact(self, history: list, pinned: int):
+        """
+        Compacted copy of `history`, or None if it is within budget.
+        history[:pinned] is never modified.
+        """
+        history = list(history)
+        head, rest = history[:pinned], history[pinned:]
+
+        summary_lines = []
+        if len(rest) >= 2 and self._is_summary(rest[0]):
+            summary_lines = entry_text(rest[0])[len(SUMMARY_PREFIX):].strip().splitlines()
+            rest = rest[2:]
+
+        if self.footprint(rest) <= self.budget_tokens or len(rest) <= self.keep_recent:
+            return None
+
+        # Drop whole user/model pairs from the front until under budget
+        cut = 0
+        tokens = self.footprint(rest)
+        while len(rest) - cut > self.keep_recent and tokens > self.budget_tokens:
+            step = 2 if len(rest) - cut >= 2 else 1
+            for entry in rest[cut:cut + step]:
+                tokens -= estimate_tokens(entry_text(entry))
+                label = "User" if entry_role(entry) == "user" else "Assistant"
+                summary_lines.append(f"- {label}: {_clip(entry_text(entry), self.line_chars)}")
+            cut += step
+        if cut == 0:
+            return None
+
+        # Keep the summary itself bounded: oldest user/assistant pairs go first
+        while len(summary_lines) > 2 and estimate_tokens("\n".join(summary_lines)) > self.summary_tokens:
+            del summary_lines[:2]
+
+        summary = [
+            {"role": "user", "parts": [SUMMARY_PREFIX + "\n" + "\n".join(summary_lines)]},
+            {"role": "model", "parts": [SUMMARY_ACK]},
+        ]
+        return head + summary + rest[cut:]
@@ -0,0 +1,95 @@
+# Deferred imports of the heavy SDKs, with an import-time report
+#
+# google.generativeai, PIL and firebase_admin take a noticeable share of a cold
+# start, yet a visitor still at the password gate needs none of them. Modules
+# wrapped in LazyModule are imported on first attribute access, and every such
+# import is timed so cold-start regressions show up after redeploys.
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Monotonic reference point: when this module was first imported (≈ process start)
+PROCESS_STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_import_times = {}   # module name -> seconds spent importing it
+
+
+def timed_import(name: str):
+    """
+    Import `name`, recording how long it took if it was not loaded yet.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - started
+        _import_times[name] = elapsed
+        logger.info("Imported %s in %.1f ms", name, elapsed * 1000)
+        return module
+
+
+class LazyModule:
+    """
+    Stand-in for a module that imports it on first attribute access:
+        genai = LazyModule("google.generativeai")
+        genai.GenerativeModel(...)   # import happens here
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = timed_import(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_module"] is not None or self.__dict__["_name"] in sys.modules
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def import_report() -> dict:
+    """
+    {"since_start_s": ..., "imports_ms": {module: ms, ...}} sorted slowest first.
+    """
+    with _lock:
+        times = sorted(_import_times.items(), key=lambda kv: kv[1], reverse=True)
+    return {
+        "since_start_s": round(time.perf_counter() - PROCESS_STARTED, 3),
+        "imports_ms": {name: round(seconds * 1000, 1) for name, seconds in times},
+    }
+
+
+_reported = False
+
+
+def log_report_once():
+    """
+    Log the import-time breakdown the first time a script run completes in
+    this process (i.e. the cold start), then stay quiet.
+    """
+    global _reported
+    if _reported:
+        return
+    _reported = True
+    logger.warning("Cold start report: %s", import_report())
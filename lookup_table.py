@@ -0,0 +1,202 @@
+# Precomputed form-combination lookup table
+#
+# For a fixed grid the matched interventions are a pure function of
+# form_responses, and the form only allows 4*4*4*4*5*5 = 6,400 combinations.
+# This module enumerates all of them with the local matcher (grid_matcher.py)
+# and writes one bitmask per combination to a small binary file that the app
+# memory-maps; a submission then becomes one array read.
+#
+# Build from the command line:
+#     python lookup_table.py sample_tier2.json
+# which writes sample_tier2.lookup.bin next to the grid.
+#
+# Tables record the grid's hash and a fingerprint of the matcher's source, so
+# a changed grid or matcher (criteria compiler) rebuilds them on next load.
+#
+# File layout (little endian):
+#     b"IGLT" | version u16 | header length u32 | header JSON | pad to 8 bytes
+#     | one record of `words` x u64 per combination (mixed-radix order of FORM_FIELDS)
+import argparse
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+
+import grid_matcher
+from form_fields import FORM_FIELDS, PLACEHOLDER
+from grid_cache import build_snapshot
+
+MAGIC = b"IGLT"
+VERSION = 1
+_PREFIX = struct.Struct("<4sHI")
+
+
+def _matcher_fingerprint() -> str:
+    """
+    Hash of grid_matcher.py: any change to how criteria are compiled or
+    evaluated invalidates the tables built with the old code.
+    """
+    with open(grid_matcher.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+MATCHER_FINGERPRINT = _matcher_fingerprint()
+
+
+def default_lookup_path(grid_path: str) -> str:
+    return os.path.splitext(grid_path)[0] + ".lookup.bin"
+
+
+def _fields_signature(fields) -> list:
+    return [[key, list(options)] for key, _label, options in fields]
+
+
+def build_table_bytes(snapshot, fields=FORM_FIELDS) -> bytes:
+    """
+    Evaluate every form combination against a GridSnapshot and return the
+    serialized table.
+    """
+    interventions = snapshot.compiled.interventions
+    words = max(1, (len(interventions) + 63) // 64)
+    header = json.dumps({
+        "grid_sha256": snapshot.sha256,
+        "matcher": MATCHER_FINGERPRINT,
+        "fields": _fields_signature(fields),
+        "interventions": [iv["support_name"] for iv in interventions],
+        "words": words,
+    }, ensure_ascii=False).encode("utf-8")
+
+    out = bytearray(_PREFIX.pack(MAGIC, VERSION, len(header)))
+    out += header
+    out += b"\0" * (-len(out) % 8)
+
+    record = struct.Struct(f"<{words}Q")
+    keys = [key for key, _label, _options in fields]
+    for combo in itertools.product(*(options for _key, _label, options in fields)):
+        responses = dict(zip(keys, combo))
+        mask = 0
+        for i, iv in enumerate(interventions):
+            if iv["predicate"](responses) is True:
+                mask |= 1 << i
+        out += record.pack(*((mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(words)))
+    return bytes(out)
+
+
+def write_table(snapshot, out_path: str, fields=FORM_FIELDS) -> int:
+    """
+    Build and atomically write the table; returns its size in bytes.
+    """
+    data = build_table_bytes(snapshot, fields)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return len(data)
+
+
+class LookupTable:
+    """
+    Read-only view over a table file (memory-mapped) or in-memory bytes.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, header_len = _PREFIX.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an intervention lookup table (or unsupported version)")
+        start = _PREFIX.size
+        header = json.loads(bytes(buffer[start:start + header_len]).decode("utf-8"))
+        self.grid_sha256 = header["grid_sha256"]
+        self.matcher = header.get("matcher")
+        self.fields = header["fields"]
+        self.intervention_names = header["interventions"]
+        self.words = header["words"]
+        self._record = struct.Struct(f"<{self.words}Q")
+        offset = start + header_len
+        self._data_offset = offset + (-offset % 8)
+        # Per-field option positions and mixed-radix strides
+        self._positions = []
+        stride = 1
+        for key, options in reversed(self.fields):
+            self._positions.append((key, {opt: i for i, opt in enumerate(options)}, stride))
+            stride *= len(options)
+        self.size = stride
+
+    @classmethod
+    def open(cls, path: str) -> "LookupTable":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def is_valid_for(self, grid_sha256: str, fields=FORM_FIELDS) -> bool:
+        return (self.grid_sha256 == grid_sha256 and self.matcher == MATCHER_FINGERPRINT
+                and self.fields == _fields_signature(fields))
+
+    def index_of(self, form_responses: dict):
+        """
+        Record index for a set of answers, or None if an answer is not one of
+        the form's options.
+        """
+        index = 0
+        for key, positions, stride in self._positions:
+            value = form_responses.get(key)
+            pos = positions.get(PLACEHOLDER if value is None else value)
+            if pos is None:
+                return None
+            index += pos * stride
+        return index
+
+    def lookup(self, form_responses: dict):
+        """
+        Indices (grid order) of the matched interventions, or None if the
+        answers fall outside the table.
+        """
+        index = self.index_of(form_responses)
+        if index is None:
+            return None
+        words = self._record.unpack_from(self._buffer, self._data_offset + index * self._record.size)
+        mask = 0
+        for w, word in enumerate(words):
+            mask |= word << (64 * w)
+        return [i for i in range(len(self.intervention_names)) if mask >> i & 1]
+
+
+def load_or_build(snapshot, path: str = None) -> LookupTable:
+    """
+    Memory-map the table for `snapshot`, rebuilding it first if it is missing
+    or was built for a different grid, form or matcher. Falls back to an
+    in-memory table when the file cannot be written.
+    """
+    path = path or default_lookup_path(snapshot.path)
+    try:
+        table = LookupTable.open(path)
+        if table.is_valid_for(snapshot.sha256):
+            return table
+    except (OSError, ValueError):
+        pass
+    try:
+        write_table(snapshot, path)
+        return LookupTable.open(path)
+    except OSError:
+        return LookupTable(build_table_bytes(snapshot))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute matched interventions for every form combination.")
+    parser.add_argument("grid", help="grid JSON file (sample_tier2.json schema)")
+    parser.add_argument("-o", "--output", help="output file (default: <grid>.lookup.bin)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    snapshot = build_snapshot(os.path.abspath(args.grid))
+    out_path = args.output or default_lookup_path(args.grid)
+    size = write_table(snapshot, out_path)
+    table = LookupTable.open(out_path)
+    print(f"Wrote {out_path}: {table.size} combinations x {len(table.intervention_names)} interventions, "
+          f"{size} bytes in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Process-wide timing spans and size counters for the hot path
+#
+# Spans (grid load, prompt assembly, chat init, send_message, markdown render,
+# Firestore save) and prompt/response sizes are recorded as numbers,
+# aggregated across sessions into percentiles, and written to a JSON file for
+# dashboards and load tests.
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_METRICS_PATH = os.path.join(".cache", "metrics.json")
+
+# Samples kept per metric (the percentiles cover this recent window)
+DEFAULT_WINDOW = 2000
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def _summarize(samples) -> dict:
+    values = sorted(samples)
+    summary = {"count": len(values), "mean": round(sum(values) / len(values), 2) if values else 0.0}
+    for q in PERCENTILES:
+        summary[f"p{q}"] = round(percentile(values, q), 2)
+    summary["max"] = round(values[-1], 2) if values else 0.0
+    return summary
+
+
+class Metrics:
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._spans = {}    # span name -> deque of milliseconds
+        self._sizes = {}    # counter name -> deque of values
+        self._totals = {}   # name -> number of samples ever recorded
+        self._written_at = 0.0
+        self.started_at = time.time()
+
+    def _add(self, table: dict, name: str, value: float):
+        with self._lock:
+            samples = table.get(name)
+            if samples is None:
+                samples = table[name] = deque(maxlen=self.window)
+            samples.append(value)
+            self._totals[name] = self._totals.get(name, 0) + 1
+
+    def record_ms(self, name: str, ms: float, turn: dict = None):
+        self._add(self._spans, name, ms)
+        if turn is not None:
+            turn[name] = round(turn.get(name, 0.0) + ms, 1)
+
+    def observe(self, name: str, value: float, turn: dict = None):
+        """
+        Record a size (e.g. prompt_chars, response_tokens_est).
+        """
+        self._add(self._sizes, name, value)
+        if turn is not None:
+            turn[name] = value
+
+    @contextmanager
+    def span(self, name: str, turn: dict = None):
+        """
+        Time the enclosed block as `name`; also added to the `turn` dict
+        (the per-turn breakdown) if one is given.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_ms(name, (time.perf_counter() - started) * 1000, turn)
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = {name: list(samples) for name, samples in self._spans.items()}
+            sizes = {name: list(samples) for name, samples in self._sizes.items()}
+            totals = dict(self._totals)
+        return {
+            "generated_at": time.time(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "spans_ms": {name: dict(_summarize(v), total=totals[name]) for name, v in sorted(spans.items())},
+            "sizes": {name: dict(_summarize(v), total=totals[name]) for name, v in sorted(sizes.items())},
+        }
+
+    def write(self, path: str = DEFAULT_METRICS_PATH, extra: dict = None):
+        data = self.summary()
+        if extra:
+            data.update(extra)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def maybe_write(self, path: str = DEFAULT_METRICS_PATH, interval: float = 15.0, extra=None) -> bool:
+        """
+        write() at most once per `interval` seconds per process. `extra` may
+        be a callable so its data is only gathered when a write happens.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._written_at < interval:
+                return False
+            self._written_at = now
+        self.write(path, extra() if callable(extra) else extra)
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._sizes.clear()
+            self._totals.clear()
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
@@ -4,13 +4,20 @@
 
 # find and replace 'Process uploaded PDF' code block with the following, keep indenting to match
 # This goes AFTER 'st.session_state.temperature = temperature' and BEFORE 'clear_button' 
+# Also add 'from upload_registry import get_registry' to your imports.
+# The uploader keeps its value across reruns, so upload through the shared
+# registry: the same file is sent to the File API once and its handle reused
+# (by every session) until it nears expiry, instead of on every chat message.
 # File upload section
 if uploaded_pdf:
     try:
-        # Upload file using File API with mime_type specified
-        uploaded_file = genai.upload_file(uploaded_pdf, mime_type="application/pdf")
-        st.session_state.uploaded_file = uploaded_file
-        st.success("File uploaded successfully!")
+        # Upload file using File API with mime_type specified (only if not uploaded already)
+        uploaded_file = get_registry().get_or_upload(
+            uploaded_pdf.getvalue(), mime_type="application/pdf", display_name=uploaded_pdf.name
+        )
+        if uploaded_file is not st.session_state.uploaded_file:
+            st.session_state.uploaded_file = uploaded_file
+            st.success("File uploaded successfully!")
                   
     except Exception as e:
         st.error(f"Error uploading file: {e}")
@@ -38,4 +45,7 @@ if uploaded_pdf:
 
         except Exception as e:
             st.error(f"An error occurred while generating the response: {e}")
-            st.session_state.debug.append(f"Error: {e}")
\ No newline at end of file
+            st.session_state.debug.append(f"Error: {e}")
+            if st.session_state.uploaded_file:
+                # In case the remote file was the problem, upload it again next time
+                get_registry().forget(st.session_state.uploaded_file)
\ No newline at end of file
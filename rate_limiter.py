@@ -0,0 +1,170 @@
+# Process-wide request limiter and retry scheduler for Gemini calls
+#
+# Free-tier models allow only a handful of requests per minute (2 for
+# gemini-1.5-pro-002, 15 for gemini-1.5-flash-002). Each call takes a token
+# from a per-model bucket, waiting in a first-come-first-served queue, and
+# quota errors are retried with jittered exponential backoff.
+import random
+import threading
+import time
+from collections import deque
+
+# Requests per minute by model name; anything else gets DEFAULT_RPM
+MODEL_RPM = {
+    "gemini-1.5-pro-002": 2,
+    "gemini-1.5-flash-002": 15,
+}
+DEFAULT_RPM = 15
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    True for rate-limit / quota errors (HTTP 429, ResourceExhausted).
+    """
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(error, "code", None) == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource exhausted" in text or "quota" in text or "rate limit" in text
+
+
+class ModelBucket:
+    """
+    Token bucket for one model, with a FIFO queue of waiting callers.
+    """
+
+    def __init__(self, rpm: float, burst: int = None):
+        self.rate = rpm / 60.0
+        self.capacity = burst if burst is not None else max(1, int(rpm) // 4 or 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _eta(self, position: int, now: float) -> float:
+        # Seconds until the caller at `position` (0 = head) gets a token
+        missing = position + 1 - self.tokens
+        wait = missing / self.rate if missing > 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def acquire(self, on_wait=None, timeout: float = None) -> float:
+        """
+        Take one token, waiting in turn. `on_wait(position, eta_seconds)` is
+        called (on this thread) while waiting, about once a second.
+        Returns the seconds waited; raises TimeoutError after `timeout`.
+        """
+        ticket = object()
+        started = time.monotonic()
+        last_report = 0.0
+        with self.cond:
+            self.queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    position = self.queue.index(ticket)
+                    if position == 0 and self.tokens >= 1 and now >= self.paused_until:
+                        self.tokens -= 1
+                        return now - started
+                    if timeout is not None and now - started > timeout:
+                        raise TimeoutError(f"waited {timeout:.0f}s for a request slot")
+                    eta = self._eta(position, now)
+                    # Short waits are not worth a status line
+                    if on_wait is not None and now - last_report >= 1.0 and max(eta, now - started) >= 1.0:
+                        last_report = now
+                        self.cond.release()
+                        try:
+                            on_wait(position + 1, eta)
+                        finally:
+                            self.cond.acquire()
+                        continue
+                    self.cond.wait(min(max(eta, 0.05), 1.0))
+            finally:
+                self.queue.remove(ticket)
+                self.cond.notify_all()
+
+    def pause(self, seconds: float):
+        """
+        Hold every caller for `seconds` (after the API reported a quota error).
+        """
+        with self.cond:
+            self.tokens = min(self.tokens, 0.0)
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            self._refill(time.monotonic())
+            return {"rpm": round(self.rate * 60, 2), "tokens": round(self.tokens, 2), "queued": len(self.queue)}
+
+
+class RateLimiter:
+    def __init__(self, limits: dict = None, default_rpm: float = DEFAULT_RPM,
+                 max_retries: int = 4, base_delay: float = 2.0, max_delay: float = 60.0):
+        self.limits = dict(MODEL_RPM if limits is None else limits)
+        self.default_rpm = default_rpm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, model_name: str) -> ModelBucket:
+        with self._lock:
+            bucket = self._buckets.get(model_name)
+            if bucket is None:
+                bucket = ModelBucket(self.limits.get(model_name, self.default_rpm))
+                self._buckets[model_name] = bucket
+            return bucket
+
+    def call(self, model_name: str, fn, on_wait=None, timeout: float = None):
+        """
+        fn() once a request slot for `model_name` is free, retried on quota
+        errors. `on_wait(status)` gets a short human-readable status line
+        while queued or backing off.
+        """
+        bucket = self.bucket(model_name)
+        queued = None
+        if on_wait is not None:
+            def queued(position, eta):
+                on_wait(f"Waiting for a request slot: position {position} in the queue, about {eta:.0f}s")
+        attempt = 0
+        while True:
+            bucket.acquire(queued, timeout)
+            try:
+                return fn()
+            except Exception as e:
+                attempt += 1
+                if not is_quota_error(e) or attempt > self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                bucket.pause(delay)
+                if on_wait is not None:
+                    on_wait(f"Rate limit reached; retrying in {delay:.0f}s (attempt {attempt + 1})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {name: bucket.stats() for name, bucket in buckets.items()}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter(limits: dict = None) -> RateLimiter:
+    """
+    The process-wide limiter; `limits` (requests per minute by model name)
+    applies when it is first created.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(dict(MODEL_RPM, **(limits or {})))
+        return _limiter
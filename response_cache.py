@@ -0,0 +1,163 @@
+# Persistent response cache for form submissions
+#
+# Replies are cached under a canonical hash of everything that determines them
+# (grid content, form responses, model, temperature, instructions.txt), in a
+# small in-memory LRU backed by SQLite so entries survive restarts.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DB_PATH = os.path.join(".cache", "responses.sqlite3")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def make_key(**parts) -> str:
+    """
+    Canonical cache key: order-independent and stable across processes.
+    e.g. make_key(grid=..., form_responses={...}, model=..., temperature=0.5,
+                  instructions=text_hash(system_prompt))
+    """
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier, size-bounded LRU: memory first, then SQLite.
+    All methods are thread-safe; failures of the disk tier are swallowed
+    (the cache is an optimization, never a reason to fail a reply).
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_memory_entries: int = 256,
+                 max_disk_entries: int = 10000):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---- disk tier ----
+    def _db(self):
+        if self._conn is None and self.db_path:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.commit()
+            except (OSError, sqlite3.Error):
+                # Missing or read-only cache directory: stay memory-only
+                self.db_path = None
+                return None
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key: str):
+        try:
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                db.commit()
+            return row[0] if row else None
+        except (OSError, sqlite3.Error):
+            return None
+
+    def _disk_put(self, key: str, value: str):
+        try:
+            db = self._db()
+            if db is None:
+                return
+            db.execute("INSERT OR REPLACE INTO responses (key, value, accessed) VALUES (?, ?, ?)",
+                       (key, value, time.time()))
+            db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            db.commit()
+        except (OSError, sqlite3.Error):
+            pass
+
+    # ---- memory tier ----
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """
+        Cached reply for `key`, or None.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            value = self._disk_get(key)
+            if value is not None:
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        if not value:
+            return
+        with self._lock:
+            self._remember(key, value)
+            self._disk_put(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                db = self._db()
+                if db is not None:
+                    db.execute("DELETE FROM responses")
+                    db.commit()
+            except (OSError, sqlite3.Error):
+                pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache(db_path: str = DEFAULT_DB_PATH) -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(db_path)
+        return _cache
@@ -0,0 +1,110 @@
+# Memory-lean session state
+#
+#   - shared_exchange(): one process-wide copy of the system-prompt / grid
+#     entries, put ahead of a session's own turns for a model request,
+#   - bounded debug and message buffers,
+#   - deep_size() / session_report() for capacity planning.
+import hashlib
+import sys
+import threading
+from collections import OrderedDict, deque
+
+DEBUG_MAX = 200      # debug strings kept per session
+MESSAGES_MAX = 200   # chat messages displayed per session (Firestore keeps the full chat)
+
+
+#########################
+# Shared immutable data #
+#########################
+_exchanges = OrderedDict()   # key -> (pair, characters)
+_exchanges_lock = threading.Lock()
+_exchanges_chars = 0
+EXCHANGES_MAX_CHARS = 64 * 1024 * 1024
+
+
+def shared_exchange(user_text: str, model_text: str, key=None) -> tuple:
+    """
+    A (user, model) history pair shared by every session with the same text,
+    so N sessions hold one copy of the system prompt / grid, not N.
+    `key` identifies the texts (e.g. the grid's sha256s) so large texts are
+    not hashed per request; it defaults to a hash of both texts. The pairs
+    kept are bounded by EXCHANGES_MAX_CHARS, oldest dropped first.
+    Treat the returned entries as read-only.
+    """
+    global _exchanges_chars
+    if key is None:
+        key = hashlib.sha256(f"{user_text}\0{model_text}".encode("utf-8")).hexdigest()
+    entry = _exchanges.get(key)
+    if entry is None:
+        with _exchanges_lock:
+            entry = _exchanges.get(key)
+            if entry is None:
+                chars = len(user_text) + len(model_text)
+                # Old grid versions; the newest pair is kept even if over the cap
+                while _exchanges and _exchanges_chars + chars > EXCHANGES_MAX_CHARS:
+                    _, (_, dropped) = _exchanges.popitem(last=False)
+                    _exchanges_chars -= dropped
+                pair = ({"role": "user", "parts": [user_text]}, {"role": "model", "parts": [model_text]})
+                entry = (pair, chars)
+                _exchanges[key] = entry
+                _exchanges_chars += chars
+    return entry[0]
+
+
+###################
+# Bounded buffers #
+###################
+def debug_buffer(items=()) -> deque:
+    return deque(items, maxlen=DEBUG_MAX)
+
+
+def trim_messages(messages: list, limit: int = MESSAGES_MAX):
+    """
+    Drop the oldest displayed messages beyond `limit`, in place.
+    """
+    excess = len(messages) - limit
+    if excess > 0:
+        del messages[:excess]
+
+
+#####################
+# Memory accounting #
+#####################
+def deep_size(obj, seen: set = None) -> int:
+    """
+    Approximate bytes reachable from `obj`. Objects already in `seen` are
+    not counted.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, type(sys), type(deep_size))):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item, 0)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(vars(item))
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def session_report(state_items) -> dict:
+    """
+    {key: approximate bytes} for one session's state, largest first.
+    Data shared between keys is counted once, under the first key.
+    """
+    seen = set()
+    sizes = {key: deep_size(value, seen) for key, value in state_items}
+    return dict(sorted(sizes.items(), key=lambda kv: kv[1], reverse=True))
@@ -0,0 +1,127 @@
+# Single-flight coalescing of identical in-flight requests
+#
+# The first request for a key runs; identical requests arriving while it is
+# in flight wait for it and get the same reply. The leader publishes its
+# streamed chunks, so waiting sessions can render the reply as it arrives.
+import threading
+import time
+
+# How long a follower waits for the leader before sending the request itself
+DEFAULT_WAIT_TIMEOUT = 120.0
+
+
+class FlightCancelled(RuntimeError):
+    """
+    The leader stopped without a result (e.g. a Streamlit rerun or st.stop()
+    interrupted it); followers should send the request themselves.
+    """
+
+
+class Flight:
+    """
+    One in-flight request: its streamed chunks so far and, once done, the
+    result or the error it failed with.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks = []
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self._done = threading.Event()
+
+    def publish(self, text: str):
+        self.chunks.append(text)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, on_progress=None, poll: float = 0.1, timeout: float = DEFAULT_WAIT_TIMEOUT):
+        """
+        The leader's result (or its exception, re-raised). `on_progress(text)`
+        gets the text streamed so far whenever it grows. Raises TimeoutError
+        after `timeout` seconds (None waits indefinitely).
+        """
+        started = time.monotonic()
+        shown = 0
+        while not self._done.wait(poll):
+            if on_progress is not None and len(self.chunks) > shown:
+                shown = len(self.chunks)
+                on_progress("".join(self.chunks[:shown]))
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError("identical request still in flight")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.led = 0
+        self.coalesced = 0
+
+    def begin(self, key: str):
+        """
+        (flight, is_leader). The leader must call finish(); everyone else
+        calls flight.wait().
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            flight = Flight(key)
+            self._flights[key] = flight
+            self.led += 1
+            return flight, True
+
+    def finish(self, flight: Flight, result=None, error: Exception = None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.result = result
+        flight.error = error
+        flight._done.set()
+
+    def do(self, key: str, fn, on_progress=None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        """
+        fn(flight) for the first caller with `key`; concurrent callers with
+        the same key receive its result. A follower whose leader is cancelled
+        or takes longer than `wait_timeout` runs fn itself.
+        Returns (result, was_shared).
+        """
+        flight, leader = self.begin(key)
+        if not leader:
+            try:
+                return flight.wait(on_progress, timeout=wait_timeout), True
+            except (FlightCancelled, TimeoutError):
+                # Not registered: nobody else waits on this one
+                return fn(Flight(key)), False
+        result = None
+        error = FlightCancelled("The original request was cancelled")
+        try:
+            result = fn(flight)
+            error = None
+            return result, False
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs for BaseExceptions (Streamlit's StopException / RerunException)
+            self.finish(flight, result=result, error=error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._flights), "led": self.led, "coalesced": self.coalesced}
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
@@ -1,13 +1,34 @@
 # DCI 691 Build 2 - Intervention Grid Searcher (R. Sherod, fall 2024)
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
 import io
 from io import BytesIO
 import json
 import os
 import uuid
 import datetime
+import hashlib
+import time
+from grid_matcher import render_tier_tables, group_by_tier, candidates_to_grid
+from grid_cache import get_grid, pin_grid
+from tier_eval import grids_by_tier, tier_prompt, tier_rows_from_reply, evaluate_tiers, merge_tier_results
+from caseload import read_profiles, dedupe, profile_key, evaluate_profiles, result_rows, rows_to_csv
+from rate_limiter import get_limiter
+from single_flight import get_single_flight, Flight, FlightCancelled
+from metrics import get_metrics, DEFAULT_METRICS_PATH
+from session_memory import debug_buffer, trim_messages, shared_exchange, session_report
+from grid_store import get_store, DEFAULT_MAX_PAGES, DEFAULT_MAX_CHARS
+from grid_index import get_index, DEFAULT_TOP_K
+from grid_prompt import VERBOSITY_LEVELS, DEFAULT_VERBOSITY, prompt_stats, encode_grid
+from form_fields import FORM_FIELDS, FORM_KEYS
+from lookup_table import load_or_build
+from chat_factory import start_chat, generation_config, pool_size, configure as configure_genai
+from lazy_imports import log_report_once
+from history_manager import HistoryManager
+from firestore_writer import get_writer
+from conversation_log import ConversationLog
+import assets
+from firestore_client import chat_document, service_account_info
+from response_cache import get_response_cache, make_key, text_hash, DEFAULT_DB_PATH
 
 # Streamlit configuration
 st.set_page_config(page_title="Streamlit Chatbot", layout="wide")
@@ -17,14 +38,19 @@ st.set_page_config(page_title="Streamlit Chatbot", layout="wide")
 # -----------------------------
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
+if "is_admin" not in st.session_state:
+    # Unlocked with ADMIN_PASSWORD instead of APP_PASSWORD: shows the performance panel
+    st.session_state.is_admin = False
 
 def _require_password():
     """
     Blocks the app until the correct password is entered.
     Set the password via Streamlit secrets: st.secrets['APP_PASSWORD']
-    or environment variable APP_PASSWORD.
+    or environment variable APP_PASSWORD. The optional ADMIN_PASSWORD also
+    unlocks the app and shows the admin-only performance panel.
     """
     expected = st.secrets.get("APP_PASSWORD") or os.environ.get("APP_PASSWORD")
+    admin_password = st.secrets.get("ADMIN_PASSWORD") or os.environ.get("ADMIN_PASSWORD")
     if not expected:
         st.error("App password not configured. Set `APP_PASSWORD` in Streamlit secrets or environment.")
         st.stop()
@@ -39,6 +65,10 @@ def _require_password():
             if pw == expected:
                 st.session_state.authenticated = True
                 st.rerun()
+            elif admin_password and pw == admin_password:
+                st.session_state.authenticated = True
+                st.session_state.is_admin = True
+                st.rerun()
             else:
                 st.error("Incorrect password.")
     if not st.session_state.authenticated:
@@ -55,16 +85,22 @@ if "should_generate_response" not in st.session_state:
     st.session_state.should_generate_response = False
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "conversation_log" not in st.session_state:
+    # Turns for Firestore: the unsaved ones plus a window for the transcript
+    st.session_state.conversation_log = ConversationLog(st.session_state.messages)
 if "model_name" not in st.session_state:
     st.session_state.model_name = "gemini-3-flash-preview"
 if "temperature" not in st.session_state:
     st.session_state.temperature = 0.5
 if "debug" not in st.session_state:
-    st.session_state.debug = []
+    # Bounded: only the newest DEBUG_MAX entries are kept (session_memory.py)
+    st.session_state.debug = debug_buffer()
 if "pdf_content" not in st.session_state:
     st.session_state.pdf_content = ""
-if "chat_session" not in st.session_state:
-    st.session_state.chat_session = None
+if "chat_turns" not in st.session_state:
+    # This session's conversation as sent to the model (plain dicts). The system
+    # prompt and grid are shared entries added per request, never stored here.
+    st.session_state.chat_turns = []
 if "pdf_uploaded" not in st.session_state:
     st.session_state.pdf_uploaded = False
 if "uploaded_file" not in st.session_state:
@@ -73,6 +109,17 @@ if "sample_tier2_loaded" not in st.session_state:
     st.session_state.sample_tier2_loaded = False
 if "sample_tier2_name" not in st.session_state:
     st.session_state.sample_tier2_name = ""
+if "caseload_request" not in st.session_state:
+    # Caseload CSV waiting to be evaluated (set by the sidebar button)
+    st.session_state.caseload_request = None
+if "caseload_rows" not in st.session_state:
+    st.session_state.caseload_rows = []
+if "uploaded_grids" not in st.session_state:
+    # Store paths (grid_store.py) of the grids uploaded in this session
+    st.session_state.uploaded_grids = []
+if "uploaded_grid_ids" not in st.session_state:
+    # Uploader file id -> store path, so reruns skip even the hashing
+    st.session_state.uploaded_grid_ids = {}
 
 if "session_id" not in st.session_state:
     # One ID per chat session—this will be the Firestore doc id
@@ -81,114 +128,152 @@ if "firestore_inited" not in st.session_state:
     st.session_state.firestore_inited = False
 if "firestore_doc_ref" not in st.session_state:
     st.session_state.firestore_doc_ref = None
+if "turn_timings" not in st.session_state:
+    # Span breakdown (ms) and sizes of this session's latest turn (metrics.py)
+    st.session_state.turn_timings = {}
 
 ##############################
 # Firestore (Firebase) setup #
 ##############################
 # This will NOT change bot behavior; it just enables saving.
-try:
-    # Lazy import so it’s easy to remove if needed
-    import firebase_admin
-    from firebase_admin import credentials, firestore as fb_firestore
-
-    if not st.session_state.firestore_inited:
-        # Prefer a service account passed via Streamlit secrets.
-        # Add your JSON under: st.secrets["FIREBASE_SERVICE_ACCOUNT"]
-        # Minimal keys used: project_id, client_email, private_key
-        if "FIREBASE_SERVICE_ACCOUNT" in st.secrets:
-            sa_info = dict(st.secrets["FIREBASE_SERVICE_ACCOUNT"])
-            # Fix escaped newlines in private_key if necessary
-            if "private_key" in sa_info and "\\n" in sa_info["private_key"]:
-                sa_info["private_key"] = sa_info["private_key"].replace("\\n", "\n")
-            cred = credentials.Certificate(sa_info)
-            if not firebase_admin._apps:
-                firebase_admin.initialize_app(cred)
-        else:
-            # Fall back to Application Default Credentials (e.g., if deployed on GCP)
-            if not firebase_admin._apps:
-                firebase_admin.initialize_app()
-
-        db = fb_firestore.client()
-        # Collection name: "chat_sessions" (change if you like)
-        st.session_state.firestore_doc_ref = db.collection("chat_sessions").document(st.session_state.session_id)
-        st.session_state.firestore_inited = True
-except Exception as _firebase_e:
-    # If Firebase isn’t configured, we silently skip—bot still runs.
-    st.session_state.firestore_inited = False
-    st.session_state.firestore_doc_ref = None
+def _firebase_service_account():
+    """
+    Prefer a service account passed via Streamlit secrets.
+    Add your JSON under: st.secrets["FIREBASE_SERVICE_ACCOUNT"]
+    Minimal keys used: project_id, client_email, private_key
+    Returns None to fall back to Application Default Credentials.
+    """
+    if "FIREBASE_SERVICE_ACCOUNT" in st.secrets:
+        return service_account_info(st.secrets["FIREBASE_SERVICE_ACCOUNT"])
+    return None
 
-def _messages_to_transcript(messages: list) -> str:
-    """
-    Convert entire conversation into a single-line-friendly string.
-    Keeps everything in one Firestore document field.
-    """
-    # Timestamp header (ISO 8601, local time not required)
-    ts = datetime.datetime.utcnow().isoformat() + "Z"
-    lines = [f"[transcript_saved_at_utc={ts}]"]
-    for m in messages:
-        role = m.get("role", "unknown")
-        # Ensure we only store text content
-        content = str(m.get("content", "")).replace("\r", " ").replace("\n", " ").strip()
-        lines.append(f"{role}: {content}")
-    # Join with a single space to keep it “one line”; Firestore stores it as a single string field
-    return " ".join(lines)
-
-def _messages_to_turns(messages: list) -> list:
-    """
-    Flat list of turns so Firestore shows one element per message.
-    Example: [{i, role, content}, ...]
-    """
-    turns = []
-    for i, m in enumerate(messages, start=1):
-        turns.append({
-            "i": i,
-            "role": m.get("role", "unknown"),
-            "content": str(m.get("content", "")),
-        })
-    return turns
-
-def _messages_to_exchanges(messages: list) -> list:
-    """
-    Group messages into user→assistant pairs for easier reading.
-    Example: [{"user": "...", "assistant": "..."}, ...]
-    """
-    exchanges = []
-    current = None
-    for m in messages:
-        role = m.get("role", "")
-        text = str(m.get("content", ""))
-        if role == "user":
-            current = {"user": text, "assistant": None}
-            exchanges.append(current)
-        elif role == "assistant":
-            if current and current.get("assistant") is None:
-                current["assistant"] = text
-            else:
-                exchanges.append({"user": None, "assistant": text})
-        else:
-            exchanges.append({"user": None, "assistant": None})
-    return exchanges
+def get_firestore_doc_ref():
+    """
+    This session's document reference, created on the first save so that
+    firebase_admin is only imported once there is something to store.
+    The client is shared by the whole process (firestore_client.py).
+    """
+    try:
+        if not st.session_state.firestore_inited:
+            st.session_state.firestore_doc_ref = chat_document(st.session_state.session_id, _firebase_service_account())
+            st.session_state.firestore_inited = True
+    except Exception as _firebase_e:
+        # If Firebase isn’t configured, we silently skip—bot still runs.
+        st.session_state.firestore_inited = False
+        st.session_state.firestore_doc_ref = None
+    return st.session_state.firestore_doc_ref
+
+def add_message(role: str, content: str) -> dict:
+    """
+    Append a chat message to both the displayed history and the incremental
+    conversation log used for Firestore payloads (conversation_log.py).
+    """
+    message = {"role": role, "content": content}
+    st.session_state.messages.append(message)
+    # Only the newest MESSAGES_MAX are kept on screen; the log keeps what Firestore still needs
+    trim_messages(st.session_state.messages)
+    st.session_state.conversation_log.append(message)
+    return message
 
-def save_chat_to_firestore():
+def send_and_render(history, parts, message_placeholder, flight=None) -> str:
+    """
+    Send one turn on top of `history` (see model_history) and render the
+    reply into `message_placeholder`. The chat is built for this request on
+    the pooled model and dropped afterwards; record the turn with record_turn.
+    With STREAM_RESPONSES on, chunks are drawn as they arrive and the
+    time to first token is logged; returns the full assembled text.
+    Chunks are also published to `flight` for sessions waiting on the same
+    request (single_flight.py).
     """
-    Writes the entire chat to a single Firestore document (one row).
+    model_name = st.session_state.model_name
+    turn = st.session_state.turn_timings
+    with metrics.span("chat_init", turn):
+        chat_session = start_chat(model_name, generation_config(st.session_state.temperature), history)
+    started = time.perf_counter()
+    prompt_text = "\n".join(p for p in parts if isinstance(p, str))
+    metrics.observe("prompt_chars", len(prompt_text), turn)
+    metrics.observe("prompt_tokens_est", prompt_stats(prompt_text)["tokens_est"], turn)
+    render_ms = 0.0
+
+    def show_wait(status):
+        message_placeholder.markdown(f"⏳ {status}…")
+
+    def render(text):
+        nonlocal render_ms
+        render_started = time.perf_counter()
+        message_placeholder.markdown(text)
+        render_ms += (time.perf_counter() - render_started) * 1000
+
+    def record(full_response):
+        metrics.record_ms("send_message", (time.perf_counter() - started) * 1000 - render_ms, turn)
+        metrics.record_ms("markdown_render", render_ms, turn)
+        metrics.observe("response_chars", len(full_response), turn)
+        metrics.observe("response_tokens_est", prompt_stats(full_response)["tokens_est"], turn)
+
+    if not STREAM_RESPONSES:
+        response = rate_limiter.call(model_name, lambda: chat_session.send_message(parts), on_wait=show_wait)
+        full_response = response.text
+        if flight is not None:
+            flight.publish(full_response)
+        render(full_response)
+        record(full_response)
+        st.session_state.debug.append(f"Response in {time.perf_counter() - started:.2f}s (not streamed)")
+        return full_response
+
+    chunks = []
+    first_token_at = None
+    stream = rate_limiter.call(model_name, lambda: chat_session.send_message(parts, stream=True), on_wait=show_wait)
+    for chunk in stream:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. a final safety/finish chunk)
+            continue
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        chunks.append(text)
+        if flight is not None:
+            flight.publish(text)
+        render("".join(chunks) + "▌")
+    full_response = "".join(chunks)
+    render(full_response)
+    record(full_response)
+    total = time.perf_counter() - started
+    ttft = (first_token_at - started) if first_token_at else total
+    metrics.record_ms("time_to_first_token", ttft * 1000, turn)
+    st.session_state.debug.append(f"Time to first token: {ttft:.2f}s, full response: {total:.2f}s")
+    return full_response
+
+def save_chat_to_firestore(final: bool = False):
+    """
+    Queues this session's new turns for its Firestore document (one row) on
+    the background writer (firestore_writer.py); the transcript and exchanges
+    are rebuilt off the script thread and written periodically, and always
+    when `final` is set. Never waits on the network.
     Safe no-op if Firestore isn’t configured.
     """
     try:
-        if not st.session_state.firestore_doc_ref:
-            return
-        payload = {
-            "session_id": st.session_state.session_id,
-            "model_name": st.session_state.get("model_name", None),
-            "transcript": _messages_to_transcript(st.session_state.get("messages", [])),
-            # NEW: structured fields for readable, line-by-line viewing
-            "turns": _messages_to_turns(st.session_state.get("messages", [])),
-            "exchanges": _messages_to_exchanges(st.session_state.get("messages", [])),            
-            "message_count": len(st.session_state.get("messages", [])),
-            "saved_at_utc": datetime.datetime.utcnow()
-        }
-        # set() creates or overwrites the single document for this session id
-        st.session_state.firestore_doc_ref.set(payload)
+        with metrics.span("firestore_save", st.session_state.turn_timings):
+            doc_ref = get_firestore_doc_ref()
+            if not doc_ref:
+                return
+            log = st.session_state.conversation_log
+            get_writer().submit(
+                doc_ref,
+                fields={
+                    "session_id": st.session_state.session_id,
+                    "model_name": st.session_state.get("model_name", None),
+                    "message_count": len(log),
+                    "saved_at_utc": datetime.datetime.utcnow(),
+                },
+                # Only the turns not yet queued
+                new_turns=log.unsaved(),
+                summary=log.snapshot(),
+                force_summary=final,
+            )
+            log.mark_saved()
     except Exception as _save_e:
         # Don’t surface any Firestore issues to users
         pass
@@ -207,14 +292,19 @@ st.markdown("""
 
 # Display image
 image_path = 'Tier 2 and Tier 3 Intervention Grid Search.jpg'
+# Credits under the header image, built once per process
+CREDITS_HTML = (
+    "<div style='text-align: center;'><small style='color: rgb(128, 128, 128);'>Created by Rebecca Sherod (2024)</small></div>"
+    "<div style='text-align: center;'><small style='color: rgb(128, 128, 128);'>This work was supported, in part, by ASU's Mary Lou Fulton Teachers College (MLFTC). The opinions and findings expressed in this document are those of the author and do not necessarily reflect those of the funding agency. This bot was funded in part by Project EPIC (USDE, OSEP Award Number: H325D220011).</small></div>"
+)
 try:
-    image = Image.open(image_path)
+    # Decoded and resized once per process (assets.py), not on every rerun
+    image = assets.image_bytes(image_path, max_width=900)
     # Use a 3-column layout and place the image in the center column
     _left, center, _right = st.columns([1, 2, 1])
     with center:
         st.image(image, width=900)
-    st.markdown("<div style='text-align: center;'><small style='color: rgb(128, 128, 128);'>Created by Rebecca Sherod (2024)</small></div>", unsafe_allow_html=True)
-    st.markdown("<div style='text-align: center;'><small style='color: rgb(128, 128, 128);'>This work was supported, in part, by ASU's Mary Lou Fulton Teachers College (MLFTC). The opinions and findings expressed in this document are those of the author and do not necessarily reflect those of the funding agency. This bot was funded in part by Project EPIC (USDE, OSEP Award Number: H325D220011).</small></div>", unsafe_allow_html=True)
+    st.markdown(CREDITS_HTML, unsafe_allow_html=True)
 except Exception as e:
     st.error(f"Error loading image: {e}")
 
@@ -224,21 +314,161 @@ st.write("The goal of this bot is to help you find Tier 2 and Tier 3 Interventio
 st.caption("Note: This bot is not designed to receive any identifiable information. This Bot can make mistakes. Make sure you refer back to the intervention grid to determine if it is a good fit for the student or students.")
 
 # Initialize Gemini client
-genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+# (the SDK itself is imported and configured when the first model is built)
+configure_genai(st.secrets["GOOGLE_API_KEY"])
 
 # -------- Always-use-JSON preload (no file upload to Gemini) --------
 SAMPLE_TIER2_JSON = "sample_tier2.json"
+pin_grid(SAMPLE_TIER2_JSON)
+
+# How "Submit Responses" is answered:
+#   "local"     - tables come straight from grid_matcher (no API call)
+#   "prefilter" - only the locally matched interventions are sent to the model
+#   "model"     - the whole grid is sent to the model (original behavior)
+GRID_MATCH_MODE = (st.secrets.get("GRID_MATCH_MODE") or os.environ.get("GRID_MATCH_MODE") or "local").lower()
+
+# Render assistant replies chunk by chunk as they stream in (set to "0"/"false" to disable)
+STREAM_RESPONSES = str(st.secrets.get("STREAM_RESPONSES") or os.environ.get("STREAM_RESPONSES") or "true").lower() not in ("0", "false", "no", "off")
+
+# Requests per minute per model, shared by every session (see rate_limiter.py).
+# Override with a [MODEL_RPM] table in secrets, e.g. "gemini-3-flash-preview" = 10
+rate_limiter = get_limiter(dict(st.secrets.get("MODEL_RPM") or {}))
+
+# Hot-path spans and sizes aggregated across sessions (see metrics.py),
+# written to METRICS_PATH as JSON at most every METRICS_INTERVAL seconds
+metrics = get_metrics()
+METRICS_PATH = st.secrets.get("METRICS_PATH") or os.environ.get("METRICS_PATH") or DEFAULT_METRICS_PATH
+METRICS_INTERVAL = float(st.secrets.get("METRICS_INTERVAL") or os.environ.get("METRICS_INTERVAL") or 15)
+
+# How much of the grid goes into the prompt: "minimal", "compact" or "full" (see grid_prompt.py)
+GRID_PROMPT_VERBOSITY = (st.secrets.get("GRID_PROMPT_VERBOSITY") or os.environ.get("GRID_PROMPT_VERBOSITY") or DEFAULT_VERBOSITY).lower()
+if GRID_PROMPT_VERBOSITY not in VERBOSITY_LEVELS:
+    GRID_PROMPT_VERBOSITY = DEFAULT_VERBOSITY
+
+# Chat questions are looked up in an inverted index over the grid (see grid_index.py):
+# "what is CICO?" / "which interventions use DBR?" are answered locally. Questions
+# that name interventions or match a few strongly go to the model with at most
+# CHAT_CONTEXT_TOP_K of them in place of the whole grid; all others get the whole grid.
+# Set CHAT_LOOKUP to "0"/"false" to send every question with the whole grid.
+CHAT_LOOKUP = str(st.secrets.get("CHAT_LOOKUP") or os.environ.get("CHAT_LOOKUP") or "true").lower() not in ("0", "false", "no", "off")
+CHAT_CONTEXT_TOP_K = int(st.secrets.get("CHAT_CONTEXT_TOP_K") or os.environ.get("CHAT_CONTEXT_TOP_K") or DEFAULT_TOP_K)
+
+# Caps on text extracted from an uploaded PDF grid (large district-wide binders)
+PDF_MAX_PAGES = int(st.secrets.get("PDF_MAX_PAGES") or os.environ.get("PDF_MAX_PAGES") or DEFAULT_MAX_PAGES)
+PDF_MAX_CHARS = int(st.secrets.get("PDF_MAX_CHARS") or os.environ.get("PDF_MAX_CHARS") or DEFAULT_MAX_CHARS)
+
+def get_sample_grid():
+    """
+    Shared, parsed snapshot of the sample grid (see grid_cache.py), or None.
+    Parsed once per process and re-read only when the file changes.
+    """
+    try:
+        return get_grid(SAMPLE_TIER2_JSON)
+    except Exception as e:
+        st.session_state.debug.append(f"Sample JSON load error: {e}")
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _lookup_table(grid_path: str, grid_sha256: str):
+    """
+    Memory-mapped table of matches for every form combination (see
+    lookup_table.py), built once per grid version if the file is missing.
+    """
+    return load_or_build(get_grid(grid_path))
+
+def active_grids() -> list:
+    """
+    Grids the bot works from: the uploaded ones if any, otherwise the sample.
+    """
+    grids = []
+    for path in st.session_state.uploaded_grids:
+        try:
+            grids.append(get_grid(path))
+        except Exception as e:
+            st.session_state.debug.append(f"Stored grid load error ({path}): {e}")
+    if grids:
+        return grids
+    if st.session_state.sample_tier2_loaded:
+        grid = get_sample_grid()
+        if grid is not None:
+            return [grid]
+    return []
+
+def ingest_uploads(uploaded_files):
+    """
+    Normalize newly uploaded grids into the shared store (grid_store.py).
+    A file is converted once; later reruns, re-uploads and other sessions
+    with the same file reuse the stored result.
+    """
+    paths = []
+    for uploaded in uploaded_files or []:
+        file_id = getattr(uploaded, "file_id", None) or f"{uploaded.name}:{uploaded.size}"
+        path = st.session_state.uploaded_grid_ids.get(file_id)
+        # Swept from the store since (grid_store.py): ingest it again
+        if path is None or not os.path.exists(path):
+            try:
+                started = time.perf_counter()
+                path = get_store().ingest(uploaded.getvalue(), uploaded.name,
+                                          max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS)
+                extraction = get_grid(path).data.get("extraction")
+                st.session_state.debug.append(
+                    f"Grid ingested: {uploaded.name} in {(time.perf_counter() - started) * 1000:.0f} ms"
+                    + (f", {extraction['pages_read']}/{extraction['page_count']} pages" if extraction else "")
+                )
+                if extraction and extraction.get("truncated"):
+                    st.warning(f"{uploaded.name} is very large; only its first "
+                               f"{extraction['pages_read']} pages are used.")
+            except Exception as e:
+                st.error(f"Error processing {uploaded.name}: {e}")
+                st.session_state.debug.append(f"Grid ingest error ({uploaded.name}): {e}")
+                continue
+            st.session_state.uploaded_grid_ids[file_id] = path
+        paths.append(path)
+    if paths != st.session_state.uploaded_grids:
+        st.session_state.uploaded_grids = paths
+        if paths:
+            st.session_state.pdf_uploaded = True
+
+def match_grids(grids: list, form_responses: dict):
+    """
+    Matched interventions across all active grids, or None if any grid has
+    no structured entry criteria (e.g. a PDF extract) and must go to the model.
+    """
+    if not grids or any(not grid.compiled.interventions for grid in grids):
+        return None
+    matches = []
+    for grid in grids:
+        matches.extend(match_form(grid, form_responses))
+    return matches
+
+def match_form(grid, form_responses: dict) -> list:
+    """
+    Matched interventions for a submission: a constant-time table lookup,
+    falling back to the live matcher for answers outside the table.
+    """
+    try:
+        indices = _lookup_table(grid.path, grid.sha256).lookup(form_responses)
+    except Exception as e:
+        st.session_state.debug.append(f"Lookup table unavailable: {e}")
+        indices = None
+    if indices is None:
+        return grid.compiled.match(form_responses)
+    return [grid.compiled.interventions[i] for i in indices]
+
+def current_grid_text() -> str:
+    """
+    Grid text for the prompt, rendered from the shared grid snapshots.
+    """
+    grids = active_grids()
+    if grids:
+        return "\n\n".join(grid.prompt(GRID_PROMPT_VERBOSITY) for grid in grids)
+    return st.session_state.get("pdf_content", "")
+
 try:
     if not st.session_state.sample_tier2_loaded:
         if os.path.exists(SAMPLE_TIER2_JSON):
-            with open(SAMPLE_TIER2_JSON, "r", encoding="utf-8") as jf:
-                data = json.load(jf)
-            # Join page texts (fallback to whole file if structure differs)
-            pages = data.get("pages")
-            if isinstance(pages, list):
-                st.session_state.pdf_content = "\n\n".join(p.get("text", "") for p in pages)
-            else:
-                st.session_state.pdf_content = json.dumps(data, ensure_ascii=False, indent=2)
+            # Parsed once per process; sessions only mark it as loaded
+            get_grid(SAMPLE_TIER2_JSON)
             st.session_state.uploaded_file = None
             st.session_state.pdf_uploaded = True
             st.session_state.sample_tier2_loaded = True
@@ -250,18 +480,270 @@ except Exception as e:
     st.error(f"Error loading sample Tier 2 JSON: {e}")
     st.session_state.debug.append(f"Sample JSON load error: {e}")
 
+# -------- Shared system prompt / grid entries --------
+# The system prompt and the grid are sent as user/model exchanges ahead of the
+# session's own turns. One copy of each is shared by every session and the
+# history is assembled per request, so sessions never hold the grid.
+GRID_SEED_ACK = "I have received the intervention grid and will use it when responding."
+
+def _grid_seed_key():
+    """
+    Identifies the grid version sent with model requests (None if no grid).
+    """
+    grids = active_grids()
+    if grids:
+        return ",".join(grid.sha256 for grid in grids) + f":{GRID_PROMPT_VERBOSITY}"
+    text = st.session_state.get("pdf_content", "")
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text else None
+
+def _grid_seed_messages() -> list:
+    grid_text = current_grid_text()
+    if not grid_text:
+        return []
+    # Shared by every session using this grid version
+    return list(shared_exchange("Intervention Grid (text extract):\n" + grid_text, GRID_SEED_ACK,
+                                key=("grid", _grid_seed_key())))
+
+def candidate_grid_messages(grids: list, matches: list) -> list:
+    """
+    Grid exchange holding only the locally matched interventions ("prefilter"
+    mode), sent in place of the shared grid entries.
+    """
+    grid_text = "\n\n".join(
+        encode_grid(candidates_to_grid(grid.data, matches), GRID_PROMPT_VERBOSITY) for grid in grids
+    )
+    return [
+        {"role": "user", "parts": ["Intervention Grid (text extract; only the interventions whose entry "
+                                   "criteria matched this student locally):\n" + grid_text]},
+        {"role": "model", "parts": [GRID_SEED_ACK]},
+    ]
+
+def system_messages() -> list:
+    """
+    The system prompt exchange, one copy shared by every session.
+    """
+    return list(shared_exchange(f"System: {system_prompt}", "Understood. I will follow these instructions."))
+
+def model_history(grid_messages: list = None) -> list:
+    """
+    History for one model request: the shared system prompt, the grid
+    entries (the shared full grid unless `grid_messages` replaces them) and
+    this session's turns.
+    """
+    if grid_messages is None:
+        grid_messages = _grid_seed_messages()
+    return system_messages() + grid_messages + st.session_state.chat_turns
+
+def record_turn(user_text: str, reply: str):
+    """
+    Add a turn (answered by the model, locally or from the cache) to this
+    session's history, so follow-up questions see it.
+    """
+    st.session_state.chat_turns.append({"role": "user", "parts": [user_text]})
+    st.session_state.chat_turns.append({"role": "model", "parts": [reply]})
+
+# -------- Identical in-flight submissions share one request (single_flight.py) --------
+single_flight = get_single_flight()
+
+# -------- Response cache for form submissions (shared by all sessions) --------
+response_cache = get_response_cache(
+    st.secrets.get("RESPONSE_CACHE_PATH") or os.environ.get("RESPONSE_CACHE_PATH") or DEFAULT_DB_PATH
+)
+
+def form_cache_key(form_responses: dict = None) -> str:
+    """
+    Everything that determines the reply to a form submission.
+    """
+    if form_responses is None:
+        form_responses = st.session_state.form_responses
+    return make_key(
+        grid=_grid_seed_key(),
+        form_responses=dict(form_responses),
+        model=st.session_state.model_name,
+        temperature=st.session_state.temperature,
+        instructions=text_hash(system_prompt),
+        match_mode=GRID_MATCH_MODE,
+    )
+
+def form_prompt(form_responses: dict) -> str:
+    """
+    The chat message a form submission is sent as.
+    """
+    combined_prompt = f"""Using the uploaded intervention grid, please analyze the following student information:
+
+Form Responses:
+"""
+    for q, a in form_responses.items():
+        combined_prompt += f"{q}: {a}\n"
+
+    combined_prompt += "\nPlease analyze this information against the intervention grid and suggest appropriate interventions."
+    return combined_prompt
+
+# -------- Tier 2 and Tier 3 evaluated concurrently --------
+def evaluate_form_by_tier(tier_grids: dict, form_text: str):
+    """
+    One local match or stand-alone model request per tier (tier_eval.py),
+    merged into the instructions.txt tables. Local matches (which use the
+    lookup table cache and session state) run here on the script thread;
+    only the model requests run in parallel on worker threads.
+    Returns (markdown, whether every tier succeeded).
+    """
+    model_name = st.session_state.model_name
+    config = generation_config(st.session_state.temperature)
+    form_responses = dict(st.session_state.form_responses)
+    system_history = system_messages()
+
+    def model_task(tier, grids):
+        if GRID_MATCH_MODE == "prefilter" and all(grid.compiled.interventions for grid in grids):
+            # Only this profile's candidates: not worth sharing between sessions
+            history = system_history + candidate_grid_messages(grids, match_grids(grids, form_responses))
+        else:
+            grid_text = "\n\n".join(grid.prompt(GRID_PROMPT_VERBOSITY) for grid in grids)
+            grid_key = ("grid", ",".join(grid.sha256 for grid in grids) + f":{GRID_PROMPT_VERBOSITY}")
+            history = system_history + list(
+                shared_exchange("Intervention Grid (text extract):\n" + grid_text, GRID_SEED_ACK, key=grid_key)
+            )
+        prompt = tier_prompt(tier, form_text)
+
+        def run():
+            chat = start_chat(model_name, config, history)
+            reply = rate_limiter.call(model_name, lambda: chat.send_message(prompt)).text
+            return tier_rows_from_reply(reply, tier)
+        return run
+
+    started = time.perf_counter()
+    local_results, local_errors = {}, {}
+    tasks = {}
+    for tier, grids in tier_grids.items():
+        if GRID_MATCH_MODE == "local" and all(grid.compiled.interventions for grid in grids):
+            try:
+                local_results[tier] = match_grids(grids, form_responses)
+            except Exception as e:
+                local_errors[tier] = e
+        else:
+            tasks[tier] = model_task(tier, grids)
+    results, errors = evaluate_tiers(tasks)
+    results.update(local_results)
+    errors.update(local_errors)
+    st.session_state.debug.append(
+        f"Per-tier evaluation in {time.perf_counter() - started:.2f}s: "
+        + ", ".join(f"Tier {t}: {len(rows)} rows" for t, rows in sorted(results.items()))
+        + "".join(f", Tier {t} failed: {e}" for t, e in sorted(errors.items()))
+    )
+    return merge_tier_results(results, errors), not errors
+
+# -------- Batch ("caseload") mode --------
+# Concurrent model requests per caseload (distinct profiles only)
+CASELOAD_WORKERS = int(st.secrets.get("CASELOAD_WORKERS") or os.environ.get("CASELOAD_WORKERS") or 4)
+
+def caseload_evaluator(unique: dict):
+    """
+    (function, workers) evaluating one profile to {tier: [support_name, ...]}:
+    the local matcher on the script thread when the grids allow it, otherwise
+    the response cache or a stand-alone model request on `workers` threads.
+    Session values (and the cache keys, which read them) are captured here
+    because worker threads cannot read session state.
+    """
+    grids = active_grids()
+    if GRID_MATCH_MODE == "local" and match_grids(grids, {}) is not None:
+        def evaluate_locally(profile):
+            return {tier: [iv["support_name"] for iv in rows]
+                    for tier, rows in group_by_tier(match_grids(grids, profile)).items()}
+        return evaluate_locally, 0
+
+    model_name = st.session_state.model_name
+    config = generation_config(st.session_state.temperature)
+    history = system_messages() + _grid_seed_messages()
+    cache_keys = {key: form_cache_key(profile) for key, profile in unique.items()}
+
+    def evaluate_with_model(profile):
+        cache_key = cache_keys[profile_key(profile)]
+        reply = response_cache.get(cache_key)
+        if reply is None:
+            def ask(flight):
+                chat = start_chat(model_name, config, history)
+                text = rate_limiter.call(model_name, lambda: chat.send_message(form_prompt(profile))).text
+                response_cache.put(cache_key, text)
+                return text
+            reply, _shared = single_flight.do(cache_key, ask)
+        return {tier: [row["support_name"] for row in tier_rows_from_reply(reply, tier)] for tier in (2, 3)}
+    return evaluate_with_model, CASELOAD_WORKERS
+
+def run_caseload(csv_bytes: bytes, table_placeholder):
+    """
+    Evaluate a caseload CSV, redrawing the results table as profiles finish.
+    """
+    try:
+        profiles, problems = read_profiles(csv_bytes)
+    except Exception as e:
+        st.error(f"Could not read the caseload CSV: {e}")
+        return []
+    for problem in problems[:10]:
+        st.warning(problem)
+    unique = dedupe(profiles)
+    evaluate, workers = caseload_evaluator(unique)
+
+    started = time.perf_counter()
+    results, errors = {}, {}
+    progress = st.progress(0.0, text=f"Evaluating {len(unique)} distinct profiles ({len(profiles)} students)...")
+    last_drawn = 0.0
+    for done, (key, result, error) in enumerate(evaluate_profiles(unique, evaluate, workers), start=1):
+        if error is None:
+            results[key] = result
+        else:
+            errors[key] = error
+        progress.progress(done / len(unique), text=f"{done} of {len(unique)} distinct profiles evaluated")
+        # Redraw at most ~4 times a second, and always for the last one
+        if done == len(unique) or time.perf_counter() - last_drawn > 0.25:
+            table_placeholder.dataframe(result_rows(profiles, results, errors), use_container_width=True)
+            last_drawn = time.perf_counter()
+    progress.empty()
+    rows = result_rows(profiles, results, errors)
+    table_placeholder.dataframe(rows, use_container_width=True)
+    st.session_state.debug.append(
+        f"Caseload: {len(profiles)} rows, {len(unique)} distinct, {len(errors)} failed, "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+    return rows
+
+# -------- Per-session memory (capacity planning) --------
+def session_memory_report() -> dict:
+    """
+    Approximate bytes held by this session, by key. Walks the whole session
+    state, so it only runs on request from the admin panel.
+    """
+    return session_report((key, st.session_state[key]) for key in st.session_state)
+
+# -------- Bounded chat history --------
+# Estimated tokens of this session's turns kept verbatim (the shared system
+# prompt and grid are not counted); older exchanges become a compact summary
+HISTORY_TOKEN_BUDGET = int(st.secrets.get("HISTORY_TOKEN_BUDGET") or os.environ.get("HISTORY_TOKEN_BUDGET") or 12000)
+history_manager = HistoryManager(budget_tokens=HISTORY_TOKEN_BUDGET)
+
+def compact_chat_history():
+    """
+    Keep this session's turns within HISTORY_TOKEN_BUDGET (history_manager.py).
+    """
+    compacted = history_manager.compact(st.session_state.chat_turns, 0)
+    if compacted is not None:
+        st.session_state.chat_turns = compacted
+        st.session_state.debug.append(f"Chat history compacted to ~{history_manager.footprint(compacted)} tokens")
+
 # Sidebar for model and temperature selection
 with st.sidebar:
 
-    # File upload section - show Tier 2 and Tier 3 slots, but DISABLED
+    # File upload section - Tier 2 and/or Tier 3 grids (PDF, or JSON in the sample_tier2.json schema)
     st.markdown("<h1 style='text-align: center;'>Upload Intervention Grid</h1>", unsafe_allow_html=True)
 
     # Match the screenshot: caption above, no bold label on the uploader
     st.caption("Upload Tier 2 or Tier 3 Intervention Grid:")
-    st.file_uploader("Tier 2 or Tier 3 Intervention Grid (disabled)",
-                     type=["pdf"], disabled=True, key="tier2_disabled_slot",
-                     label_visibility="collapsed")
-    if st.session_state.sample_tier2_loaded:
+    uploaded_grid_files = st.file_uploader("Tier 2 or Tier 3 Intervention Grid",
+                                           type=["pdf", "json"], accept_multiple_files=True,
+                                           key="grid_uploads", label_visibility="collapsed")
+    ingest_uploads(uploaded_grid_files)
+    if st.session_state.uploaded_grids:
+        st.success(f"✅ {len(st.session_state.uploaded_grids)} Intervention Grid(s) uploaded.")
+    elif st.session_state.sample_tier2_loaded:
         st.success("✅ A Tier 2 Intervention Grid has already been uploaded.")
     else:
         st.info("No sample detected.")
@@ -274,41 +756,12 @@ with st.sidebar:
         st.session_state.form_responses = {}
 
     with st.form("user_form"):
-        st.session_state.form_responses['Academic_read'] = st.selectbox(
-            "Reading Performance:", 
-            options=["Click to select", "below average", "average", "above average"], 
-            key="Academic_read"
-        )
-
-        st.session_state.form_responses['Academic_math'] = st.selectbox(
-            "Math Performance:", 
-            options=["Click to select", "below average", "average", "above average"], 
-            key="Academic_math"
-        )
-
-        st.session_state.form_responses['SRSS_I'] = st.selectbox(
-            "SRSS-Internalizing Score:", 
-            options=["Click to select", "Low", "Moderate", "High"], 
-            key="SRSS_I"
-        )
-
-        st.session_state.form_responses['SRSS_E'] = st.selectbox(
-            "SRSS-Externalizing Score:", 
-            options=["Click to select", "Low", "Moderate", "High"], 
-            key="SRSS_E"
-        )
-
-        st.session_state.form_responses['Days_missed'] = st.selectbox(
-            "Number of Days Student has Missed:", 
-            options=["Click to select", "0-5 days", "6-10 days", "11-15 days", "16+ days"], 
-            key="Days_missed"
-        )
-
-        st.session_state.form_responses['ODRs'] = st.selectbox(
-            "Number of Office Discipline Referrals Earned:", 
-            options=["Click to select", "0-1 referrals", "2-3 referrals", "4-5 referrals", "6+ referrals"], 
-            key="ODRs"
-        )
+        for field_key, label, options in FORM_FIELDS:
+            st.session_state.form_responses[field_key] = st.selectbox(
+                label,
+                options=options,
+                key=field_key
+            )
 
         submit_button = st.form_submit_button("Submit Responses")
         if submit_button:
@@ -319,38 +772,53 @@ with st.sidebar:
                 st.session_state.should_generate_response = True
                 st.success("Thank you! Your responses have been recorded.")
     
+    # Batch mode: a whole class from a CSV (one row per student, the six form fields as columns)
+    with st.expander("Caseload (batch) mode"):
+        st.caption("CSV of de-identified students with columns: " + ", ".join(FORM_KEYS)
+                   + " (and optionally student_id).")
+        caseload_file = st.file_uploader("Caseload CSV", type=["csv"], key="caseload_csv",
+                                         label_visibility="collapsed")
+        if st.button("Evaluate caseload", disabled=caseload_file is None):
+            if not st.session_state.pdf_uploaded:
+                st.error("Please upload the Intervention Grid first before evaluating a caseload.")
+            else:
+                st.session_state.caseload_request = caseload_file.getvalue()
+
     # Clear chat functionality
     clear_button = st.button("Clear Chat")
     if clear_button:
+        # Final write of the finished chat (queued; does not wait on Firestore)
+        save_chat_to_firestore(final=True)
         st.session_state.messages = []
-        st.session_state.debug = []
-        st.session_state.chat_session = None
+        st.session_state.conversation_log = ConversationLog()
+        st.session_state.debug = debug_buffer()
+        st.session_state.chat_turns = []
         st.session_state.pdf_uploaded = False
         st.session_state.uploaded_file = None
+        # Grids still in the uploader are re-attached (from the store) on the rerun
+        st.session_state.uploaded_grids = []
         # Reset Student Information form so users must reselect options
         # For widgets in a form, delete their state and let defaults apply on rerun.
-        for k in ["Academic_read", "Academic_math", "SRSS_I", "SRSS_E", "Days_missed", "ODRs"]:
+        for k in FORM_KEYS:
             st.session_state.pop(k, None)
         st.session_state.form_responses = {}        # clear stored form responses mirror
         st.session_state.form_submitted = False
         st.session_state.should_generate_response = False
+        st.session_state.caseload_rows = []
 
         # OPTIONAL: start a brand-new Firestore document for the next chat
         st.session_state.session_id = str(uuid.uuid4())
-        try:
-            st.session_state.firestore_doc_ref = fb_firestore.client()\
-                .collection("chat_sessions")\
-                .document(st.session_state.session_id)
-        except Exception:
-            pass
+        # Created on the next save (see get_firestore_doc_ref)
+        st.session_state.firestore_inited = False
+        st.session_state.firestore_doc_ref = None
         st.success("Chat cleared!")
         st.rerun()
 
 # Load system prompt
 def load_text_file(file_path):
     try:
-        with open(file_path, 'r') as file:
-            return file.read()
+        # Cached per process; re-read only when the file changes
+        return assets.load_text(file_path)
     except Exception as e:
         st.error(f"Error loading text file: {e}")
         return ""
@@ -362,6 +830,20 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
+# Caseload results (streamed while evaluating, then kept for download)
+if st.session_state.caseload_request is not None or st.session_state.caseload_rows:
+    st.markdown("### Caseload results")
+    table_placeholder = st.empty()
+    if st.session_state.caseload_request is not None:
+        csv_bytes = st.session_state.caseload_request
+        st.session_state.caseload_request = None
+        st.session_state.caseload_rows = run_caseload(csv_bytes, table_placeholder)
+    else:
+        table_placeholder.dataframe(st.session_state.caseload_rows, use_container_width=True)
+    if st.session_state.caseload_rows:
+        st.download_button("Download results (CSV)", rows_to_csv(st.session_state.caseload_rows),
+                           file_name="caseload_interventions.csv", mime="text/csv")
+
 # Handle form submission and generate response
 if st.session_state.should_generate_response:
     if not st.session_state.pdf_uploaded:
@@ -369,17 +851,10 @@ if st.session_state.should_generate_response:
         st.session_state.should_generate_response = False
         st.rerun()
     else:    
-        combined_prompt = f"""Using the uploaded intervention grid, please analyze the following student information:
-
-Form Responses:
-"""
-        for q, a in st.session_state.form_responses.items():
-            combined_prompt += f"{q}: {a}\n"
-        
-        combined_prompt += "\nPlease analyze this information against the intervention grid and suggest appropriate interventions."
-    
-        current_message = {"role": "user", "content": combined_prompt}
-        st.session_state.messages.append(current_message)
+        turn_started = time.perf_counter()
+        st.session_state.turn_timings = {"kind": "form"}
+        with metrics.span("prompt_assembly", st.session_state.turn_timings):
+            current_message = add_message("user", form_prompt(st.session_state.form_responses))
 
         with st.chat_message("user"):
             st.markdown(current_message["content"])
@@ -387,51 +862,97 @@ Form Responses:
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
 
-            if st.session_state.chat_session is None:
-                try:
-                    generation_config = {
-                        "temperature": st.session_state.temperature,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                        "max_output_tokens": 4096,
-                    }
-                    model = genai.GenerativeModel(
-                        model_name=st.session_state.model_name,
-                        generation_config=generation_config,
-                    )
-                    
-                    initial_messages = [
-                        {"role": "user", "parts": [f"System: {system_prompt}"]},
-                        {"role": "model", "parts": ["Understood. I will follow these instructions."]},
-                    ]
-                    
-                    st.session_state.chat_session = model.start_chat(history=initial_messages)
-                    st.session_state.debug.append("Chat session initialized successfully")
-                except Exception as e:
-                    st.error(f"Error initializing chat session: {str(e)}")
-                    st.session_state.debug.append(f"Chat initialization error: {str(e)}")
-                    st.stop()
+            # Look up the matched interventions (precomputed per grid version)
+            with metrics.span("grid_load", st.session_state.turn_timings):
+                grids = active_grids()
+                tier_grids = grids_by_tier(grids)
+            with metrics.span("grid_match", st.session_state.turn_timings):
+                matches = match_grids(grids, st.session_state.form_responses)
+            with metrics.span("response_cache_lookup", st.session_state.turn_timings):
+                cache_key = form_cache_key()
+                cached_response = response_cache.get(cache_key) if GRID_MATCH_MODE != "local" else None
 
-            try:
-                # Combine PDF and prompt into a single message to reduce API calls
-                parts = []
-                # Always include JSON text of the grid (no PDF)
-                if st.session_state.get("pdf_content"):
-                    parts.append("Intervention Grid (text extract):\n" + st.session_state.pdf_content)
-                parts.append(current_message["content"])
-                
-                # Send everything in one API call
-                response = st.session_state.chat_session.send_message(parts)
-                full_response = response.text
+            if GRID_MATCH_MODE == "local" and matches is not None:
+                # Answer straight from the compiled grid; no model call
+                full_response = render_tier_tables(group_by_tier(matches))
                 message_placeholder.markdown(full_response)
-                st.session_state.messages.append({"role": "assistant", "content": full_response})
-                st.session_state.debug.append("Assistant response generated")
-                # Save the entire conversation snapshot to Firestore (keep this INSIDE the try)
-                save_chat_to_firestore()                
-            except Exception as e:
-                st.error(f"An error occurred while generating the response: {str(e)}")
-                st.session_state.debug.append(f"Error: {str(e)}")
+                add_message("assistant", full_response)
+                st.session_state.debug.append(f"Local grid match: {len(matches)} interventions")
+                record_turn(current_message["content"], full_response)
+                save_chat_to_firestore()
+            elif cached_response is not None:
+                # Same grid, profile, model, temperature and instructions as an earlier reply
+                full_response = cached_response
+                message_placeholder.markdown(full_response)
+                add_message("assistant", full_response)
+                st.session_state.debug.append(f"Response cache hit: {response_cache.stats()}")
+                record_turn(current_message["content"], full_response)
+                save_chat_to_firestore()
+            elif len(tier_grids) > 1:
+                # Separate Tier 2 and Tier 3 grids: evaluate both tiers at once
+                with st.spinner("Evaluating Tier 2 and Tier 3 interventions..."):
+                    (full_response, complete), shared = single_flight.do(
+                        cache_key, lambda flight: evaluate_form_by_tier(tier_grids, current_message["content"])
+                    )
+                if shared:
+                    st.session_state.debug.append("Identical submission in flight; reply shared")
+                message_placeholder.markdown(full_response)
+                add_message("assistant", full_response)
+                if complete and not shared:
+                    response_cache.put(cache_key, full_response)
+                record_turn(current_message["content"], full_response)
+                save_chat_to_firestore()
+            else:
+                # Another session may be sending this exact submission right now
+                flight, leader = single_flight.begin(cache_key)
+                if not leader:
+                    try:
+                        full_response = flight.wait(
+                            on_progress=lambda text: message_placeholder.markdown(text + "▌")
+                        )
+                        message_placeholder.markdown(full_response)
+                        add_message("assistant", full_response)
+                        st.session_state.debug.append("Identical submission in flight; reply shared")
+                        record_turn(current_message["content"], full_response)
+                        save_chat_to_firestore()
+                    except (FlightCancelled, TimeoutError) as e:
+                        # The other session was interrupted or is stuck: send it ourselves
+                        st.session_state.debug.append(f"Shared request unavailable ({e}); sending directly")
+                        flight, leader = Flight(cache_key), True
+                    except Exception as e:
+                        st.error(f"An error occurred while generating the response: {str(e)}")
+                        st.session_state.debug.append(f"Error: {str(e)}")
+                if leader:
+                    try:
+                        # The grid entries go ahead of this session's turns: the shared
+                        # full grid, or in prefilter mode only the locally matched
+                        # interventions (for this request only, not kept in the history)
+                        compact_chat_history()
+                        grid_messages = None
+                        if GRID_MATCH_MODE == "prefilter" and matches is not None:
+                            grid_messages = candidate_grid_messages(grids, matches)
+                        parts = [current_message["content"]]
+
+                        # Send everything in one API call
+                        full_response = send_and_render(model_history(grid_messages), parts,
+                                                        message_placeholder, flight)
+                        add_message("assistant", full_response)
+                        st.session_state.debug.append("Assistant response generated")
+                        record_turn(current_message["content"], full_response)
+                        response_cache.put(cache_key, full_response)
+                        single_flight.finish(flight, result=full_response)
+                        # Save the entire conversation snapshot to Firestore (keep this INSIDE the try)
+                        save_chat_to_firestore()
+                    except Exception as e:
+                        single_flight.finish(flight, error=e)
+                        st.error(f"An error occurred while generating the response: {str(e)}")
+                        st.session_state.debug.append(f"Error: {str(e)}")
+                    finally:
+                        if not flight.done:
+                            # e.g. a rerun interrupted the request
+                            single_flight.finish(flight, error=FlightCancelled("The original request was cancelled"))
 
+        metrics.record_ms("turn_total", (time.perf_counter() - turn_started) * 1000, st.session_state.turn_timings)
         st.session_state.should_generate_response = False
         st.rerun()
 
@@ -439,8 +960,9 @@ Form Responses:
 user_input = st.chat_input("Type here:")
 
 if user_input:
-    current_message = {"role": "user", "content": user_input}
-    st.session_state.messages.append(current_message)
+    turn_started = time.perf_counter()
+    st.session_state.turn_timings = {"kind": "chat"}
+    current_message = add_message("user", user_input)
 
     with st.chat_message("user"):
         st.markdown(current_message["content"])
@@ -448,50 +970,101 @@ if user_input:
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
 
-        if st.session_state.chat_session is None:
-            try:
-                generation_config = {
-                    "temperature": st.session_state.temperature,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "max_output_tokens": 4096,
-                }
-                model = genai.GenerativeModel(
-                    model_name=st.session_state.model_name,
-                    generation_config=generation_config,
-                )
-                
-                initial_messages = [
-                    {"role": "user", "parts": [f"System: {system_prompt}"]},
-                    {"role": "model", "parts": ["Understood. I will follow these instructions."]},
-                ]
-                
-                st.session_state.chat_session = model.start_chat(history=initial_messages)
-                st.session_state.debug.append("Chat session initialized successfully")
-            except Exception as e:
-                st.error(f"Error initializing chat session: {str(e)}")
-                st.session_state.debug.append(f"Chat initialization error: {str(e)}")
-                st.stop()
+        local_answer = None
+        scoped_context = ""
+        if CHAT_LOOKUP:
+            with metrics.span("grid_lookup", st.session_state.turn_timings):
+                grids = active_grids()
+                if grids:
+                    index = get_index(grids)
+                    local_answer = index.answer(user_input)
+                    if local_answer is None:
+                        scoped_context = index.context_for(user_input, CHAT_CONTEXT_TOP_K, GRID_PROMPT_VERBOSITY)
 
         try:
-            # Include JSON grid text with ad-hoc user messages as well
-            parts = []
-            if st.session_state.get("pdf_content"):
-                parts.append("Intervention Grid (text extract):\n" + st.session_state.pdf_content)
-            parts.append(user_input)
-            response = st.session_state.chat_session.send_message(parts)
-            full_response = response.text
-            message_placeholder.markdown(full_response)
-            st.session_state.messages.append({"role": "assistant", "content": full_response})
-            st.session_state.debug.append("Assistant response generated")
-            # Save the entire conversation snapshot to Firestore (keep this INSIDE the try)
-            save_chat_to_firestore()            
+            if local_answer is not None:
+                # Name / keyword question answered from the grid index; no model call
+                full_response = local_answer
+                message_placeholder.markdown(full_response)
+                add_message("assistant", full_response)
+                st.session_state.debug.append("Chat question answered from the grid index")
+                record_turn(user_input, full_response)
+                save_chat_to_firestore()
+            else:
+                # When the question is clearly about a few interventions, only those go
+                # with this request (instead of the whole grid) and they are not kept in
+                # the history; otherwise the shared grid entries are sent as usual
+                with metrics.span("prompt_assembly", st.session_state.turn_timings):
+                    compact_chat_history()
+                    if scoped_context:
+                        history = model_history([])
+                        parts = ["Most relevant interventions from the intervention grid for this question:\n\n"
+                                 + scoped_context, user_input]
+                    else:
+                        history = model_history()
+                        parts = [user_input]
+                full_response = send_and_render(history, parts, message_placeholder)
+                add_message("assistant", full_response)
+                st.session_state.debug.append(
+                    "Assistant response generated" + (" (top interventions only)" if scoped_context else "")
+                )
+                record_turn(user_input, full_response)
+                # Save the entire conversation snapshot to Firestore (keep this INSIDE the try)
+                save_chat_to_firestore()
         except Exception as e:
             st.error(f"An error occurred while generating the response: {str(e)}")
             st.session_state.debug.append(f"Error: {str(e)}")
 
+    metrics.record_ms("turn_total", (time.perf_counter() - turn_started) * 1000, st.session_state.turn_timings)
     st.rerun()
 
+# Import-time breakdown of the first full script run in this process (server log)
+log_report_once()
+
+def _metrics_extra() -> dict:
+    return {
+        "response_cache": response_cache.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "single_flight": single_flight.stats(),
+        "model_pool": pool_size(),
+    }
+
+# Process-wide metrics file (throttled; see METRICS_INTERVAL)
+try:
+    metrics.maybe_write(METRICS_PATH, METRICS_INTERVAL, extra=_metrics_extra)
+except Exception as e:
+    st.session_state.debug.append(f"Metrics write error: {e}")
+
+# Admin-only performance panel
+if st.session_state.is_admin:
+    with st.sidebar.expander("Performance (admin)"):
+        st.caption("Latest turn in this session (ms / sizes)")
+        st.json(st.session_state.turn_timings or {})
+        summary = metrics.summary()
+        st.caption(f"All sessions, last {metrics.window} samples per span (ms)")
+        st.dataframe(
+            [{"span": name, **stats} for name, stats in summary["spans_ms"].items()],
+            use_container_width=True, hide_index=True,
+        )
+        st.caption("Prompt / response sizes")
+        st.dataframe(
+            [{"metric": name, **stats} for name, stats in summary["sizes"].items()],
+            use_container_width=True, hide_index=True,
+        )
+        st.caption("Caches and queues")
+        st.json(_metrics_extra())
+        st.caption(f"Metrics file: {METRICS_PATH}")
+        st.download_button("Download metrics (JSON)", json.dumps(summary, indent=1),
+                           file_name="metrics.json", mime="application/json")
+        if st.checkbox("Measure this session's memory (approx. bytes by key)"):
+            report = session_memory_report()
+            metrics.observe("session_state_bytes", sum(report.values()))
+            st.write(f"Total ≈ {sum(report.values()) / 1024:.1f} KB")
+            st.json({key: size for key, size in report.items() if size})
+        st.caption("Debug log")
+        for debug_msg in list(st.session_state.debug)[-50:]:
+            st.text(debug_msg)
+
 # Debug information
 #st.sidebar.title("Debug Info")
 #for debug_msg in st.session_state.debug:
@@ -1,7 +1,8 @@
 # DCI 691 Build 2 - Streamlit Bot (R. Beghetto, fall 2024)
 import streamlit as st
 import google.generativeai as genai
-from PyPDF2 import PdfReader
+from grid_store import get_store
+from grid_cache import get_grid
 from PIL import Image
 
 # Streamlit configuration
@@ -37,8 +38,12 @@ if "temperature" not in st.session_state:
     st.session_state.temperature = 0.5
 if "debug" not in st.session_state:
     st.session_state.debug = []
-if "pdf_content" not in st.session_state:
-    st.session_state.pdf_content = ""
+if "pdf_path" not in st.session_state:
+    # Stored extract of the uploaded PDF; its text lives in the shared grid
+    # cache, not in each session's state
+    st.session_state.pdf_path = None
+if "pdf_file_id" not in st.session_state:
+    st.session_state.pdf_file_id = None
 if "chat_session" not in st.session_state:
     st.session_state.chat_session = None
 
@@ -59,16 +64,27 @@ with st.sidebar:
     clear_button = st.button("Clear Chat")
 
 # Process uploaded PDF
+# Extracted page by page, once per distinct file (content-addressed store, see
+# grid_store.py); reruns with the same upload neither re-read the PDF nor
+# reset the chat. Very large PDFs are capped at the store's page/character limits.
 if uploaded_pdf:
     try:
-        pdf_reader = PdfReader(uploaded_pdf)
-        pdf_text = ""
-        for page in pdf_reader.pages:
-            pdf_text += page.extract_text() + "\n"
-        st.session_state.pdf_content = pdf_text
-        st.session_state.debug.append(f"PDF processed: {len(pdf_text)} characters")
-        # Reset chat session when new PDF is uploaded
-        st.session_state.chat_session = None
+        file_id = getattr(uploaded_pdf, "file_id", None) or f"{uploaded_pdf.name}:{uploaded_pdf.size}"
+        if file_id != st.session_state.pdf_file_id:
+            pdf_path = get_store().ingest(uploaded_pdf.getvalue(), uploaded_pdf.name)
+            st.session_state.pdf_file_id = file_id
+            if pdf_path != st.session_state.pdf_path:
+                st.session_state.pdf_path = pdf_path
+                extraction = get_grid(pdf_path).data.get("extraction", {})
+                st.session_state.debug.append(
+                    f"PDF processed: {extraction.get('chars', 0)} characters from "
+                    f"{extraction.get('pages_read', 0)}/{extraction.get('page_count', 0)} pages "
+                    f"in {extraction.get('total_ms', 0)} ms"
+                )
+                if extraction.get("truncated"):
+                    st.warning("This PDF is very large; only its first part is used.")
+                # Reset chat session when new PDF is uploaded
+                st.session_state.chat_session = None
     except Exception as e:
         st.error(f"Error processing PDF: {e}")
         st.session_state.debug.append(f"PDF processing error: {e}")
@@ -77,7 +93,8 @@ if uploaded_pdf:
 if clear_button:
     st.session_state.messages = []
     st.session_state.debug = []
-    st.session_state.pdf_content = ""
+    st.session_state.pdf_path = None
+    st.session_state.pdf_file_id = None
     st.session_state.chat_session = None
     st.rerun()
 
@@ -132,9 +149,10 @@ if user_input:
                 {"role": "model", "parts": ["Understood. I will follow these instructions."]},
             ]
             
-            if st.session_state.pdf_content:
+            pdf_content = get_grid(st.session_state.pdf_path).prompt_text if st.session_state.pdf_path else ""
+            if pdf_content:
                 initial_messages.extend([
-                    {"role": "user", "parts": [f"The following is the content of an uploaded PDF document. Please consider this information when responding to user queries:\n\n{st.session_state.pdf_content}"]},
+                    {"role": "user", "parts": [f"The following is the content of an uploaded PDF document. Please consider this information when responding to user queries:\n\n{pdf_content}"]},
                     {"role": "model", "parts": ["I have received and will consider the PDF content in our conversation."]}
                 ])
             
@@ -0,0 +1,40 @@
+from conversation_log import ConversationLog
+
+
+def _chat(log, start, count):
+    for n in range(start, start + count):
+        log.append({"role": "user", "content": f"question {n}"})
+        log.append({"role": "assistant", "content": f"answer\n{n}"})
+
+
+def test_unsaved_turns_are_kept_until_saved():
+    log = ConversationLog(max_saved=4)
+    _chat(log, 1, 3)
+    assert [t["i"] for t in log.unsaved()] == [1, 2, 3, 4, 5, 6]
+    log.mark_saved()
+    assert log.unsaved() == []
+    _chat(log, 4, 1)
+    assert [t["i"] for t in log.unsaved()] == [7, 8]
+    assert len(log) == 8
+
+
+def test_saved_turns_are_bounded_and_feed_the_transcript():
+    log = ConversationLog(max_saved=4)
+    for n in range(1, 51):
+        _chat(log, n, 1)
+        log.mark_saved()
+    assert len(log._turns) == 4
+    summary = log.snapshot()()
+    assert summary["transcript"].endswith("user: question 49 assistant: answer 49 user: question 50 assistant: answer 50")
+    assert summary["exchanges"] == [
+        {"user": "question 49", "assistant": "answer\n49"},
+        {"user": "question 50", "assistant": "answer\n50"},
+    ]
+
+
+def test_snapshot_is_frozen():
+    log = ConversationLog()
+    log.append({"role": "user", "content": "hello"})
+    build = log.snapshot()
+    log.append({"role": "assistant", "content": "hi"})
+    assert build()["exchanges"] == [{"user": "hello", "assistant": None}]
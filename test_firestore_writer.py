@@ -0,0 +1,47 @@
+from firestore_writer import FirestoreWriter
+
+
+class _FakeDoc:
+    def __init__(self, path="chats/session", failures=0):
+        self.path = path
+        self.failures = failures
+        self.writes = []
+
+    def set(self, payload, merge=False):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("unavailable")
+        self.writes.append((payload, merge))
+
+
+def _writer(**kwargs):
+    return FirestoreWriter(array_union=list, **kwargs)
+
+
+def test_bursts_for_one_document_are_coalesced():
+    writer = _writer(coalesce_delay=0.5)
+    doc = _FakeDoc()
+    writer.submit(doc, {"updated": 1}, [{"i": 1}])
+    writer.submit(doc, {"updated": 2}, [{"i": 2}], summary=lambda: {"transcript": "t"})
+    assert writer.flush(5)
+    assert doc.writes == [({"updated": 2, "turns": [{"i": 1}, {"i": 2}], "transcript": "t"}, True)]
+    assert writer.stats()["writes"] == 1
+
+
+def test_failed_write_is_requeued_and_retried():
+    writer = _writer(coalesce_delay=0.0, base_delay=0.01, max_delay=0.02)
+    doc = _FakeDoc(failures=2)
+    writer.submit(doc, {"updated": 1}, [{"i": 1}])
+    assert writer.flush(5)
+    assert doc.writes == [({"updated": 1, "turns": [{"i": 1}]}, True)]
+    stats = writer.stats()
+    assert (stats["writes"], stats["failures"], stats["dropped"]) == (1, 2, 0)
+
+
+def test_write_is_dropped_after_max_attempts():
+    writer = _writer(coalesce_delay=0.0, base_delay=0.01, max_delay=0.02, max_attempts=2)
+    doc = _FakeDoc(failures=5)
+    writer.submit(doc, {"updated": 1})
+    assert writer.flush(5)
+    assert doc.writes == []
+    assert writer.stats()["dropped"] == 1
@@ -0,0 +1,47 @@
+import json
+import os
+import time
+
+from grid_cache import GridCache
+from grid_store import GridStore
+
+
+def _write_grid(path, name):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"tier": 2, "interventions": [{"support_name": name}]}, f)
+    return str(path)
+
+
+def test_unpinned_grids_are_evicted_least_recently_used(tmp_path):
+    cache = GridCache(stat_interval=0, max_entries=2)
+    sample = _write_grid(tmp_path / "sample.json", "Sample")
+    cache.pin(sample)
+    cache.get(sample)
+    uploads = [_write_grid(tmp_path / f"upload{i}.json", f"Upload {i}") for i in range(3)]
+    for path in uploads:
+        cache.get(path)
+    cached = set(cache._entries)
+    assert os.path.abspath(sample) in cached
+    assert os.path.abspath(uploads[0]) not in cached
+    assert {os.path.abspath(p) for p in uploads[1:]} <= cached
+    assert cache.evictions == 1
+
+
+def test_store_sweep_drops_old_and_oversized_files(tmp_path):
+    store = GridStore(str(tmp_path), max_bytes=10_000, max_age=3600)
+    old = store.ingest(json.dumps({"interventions": [], "note": "old"}).encode(), "old.json")
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+    big = store.ingest(json.dumps({"interventions": [], "pad": "x" * 8000}).encode(), "big.json")
+    os.utime(big, (time.time() - 60, time.time() - 60))
+    new = store.ingest(json.dumps({"interventions": [], "pad": "y" * 8000}).encode(), "new.json")
+    assert not os.path.exists(old)
+    assert not os.path.exists(big)
+    assert os.path.exists(new)
+
+
+def test_pdf_store_path_follows_per_call_caps(tmp_path):
+    store = GridStore(str(tmp_path))
+    default = store.path_for("abc", is_pdf=True)
+    capped = store.path_for("abc", is_pdf=True, max_pages=10, max_chars=5000)
+    assert capped != default
+    assert capped.endswith("abc-p10-c5000.json")
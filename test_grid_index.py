@@ -0,0 +1,45 @@
+import json
+import os
+
+from grid_index import GridIndex
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_tier2.json")
+
+
+def _index():
+    with open(SAMPLE, encoding="utf-8") as f:
+        return GridIndex([json.load(f)])
+
+
+def _names(index, question):
+    return [index.docs[d]["intervention"]["support_name"] for d in index.confident_matches(question)]
+
+
+def test_profile_question_gets_the_whole_grid():
+    index = _index()
+    question = "Which interventions fit a student with 6+ ODRs and high SRSS-E?"
+    assert index.answer(question) is None
+    assert index.context_for(question) == ""
+
+
+def test_named_intervention_context_includes_entry_criteria():
+    index = _index()
+    question = "What are the entry criteria for behavior contract"
+    assert _names(index, question) == ["Behavior Contract"]
+    context = index.context_for(question)
+    assert "Entry criteria" in context
+    assert "2 or more office discipline referrals" in context
+
+
+def test_tier_question_gets_the_whole_grid():
+    index = _index()
+    assert index.context_for("Which interventions are Tier 3?") == ""
+
+
+def test_only_confident_matches_are_scoped():
+    index = _index()
+    assert _names(index, "How is CICO progress monitored?") == ["Check-In/Check-Out (CICO)"]
+    assert "Progress monitoring:" in index.context_for("How is CICO progress monitored?")
+    assert "Self-Regulated Strategy Development (SRSD) for Writing" in _names(
+        index, "How do I teach students to set goals for their writing?")
+    assert _names(index, "What helps students who blurt out answers?") == []
@@ -0,0 +1,33 @@
+import json
+import os
+
+from grid_matcher import compile_criterion, compile_grids
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_tier2.json")
+
+
+def test_or_more_compares_band_floor():
+    check, kind = compile_criterion("Two or more office discipline referrals")
+    assert kind == "odr"
+    assert check({"ODRs": "2-3 referrals"}) is True
+    assert check({"ODRs": "6+ referrals"}) is True
+    assert check({"ODRs": "0-1 referrals"}) is False
+    assert check({"ODRs": "Click to select"}) is None
+
+
+def test_or_fewer_compares_band_ceiling():
+    check, kind = compile_criterion("2 or fewer absences in first 3 months of school")
+    assert kind == "absences"
+    assert check({"Days_missed": "0-2 days"}) is True
+    # The band's floor (0) is within the limit but its ceiling is not
+    assert check({"Days_missed": "0-5 days"}) is False
+    # Open-ended bands are unbounded
+    assert check({"Days_missed": "16+ days"}) is False
+    assert check({"Days_missed": "Click to select"}) is None
+
+
+def test_social_skills_needs_two_or_fewer_absences():
+    with open(SAMPLE, encoding="utf-8") as f:
+        grid = compile_grids(json.load(f))
+    names = [iv["support_name"] for iv in grid.match({"SRSS_E": "Moderate", "Days_missed": "0-5 days"})]
+    assert "Social Skills Intervention" not in names
@@ -0,0 +1,28 @@
+import os
+
+import lookup_table
+from grid_cache import build_snapshot
+from lookup_table import LookupTable, build_table_bytes, load_or_build
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_tier2.json")
+
+
+def test_table_matches_the_local_matcher():
+    snapshot = build_snapshot(SAMPLE)
+    table = LookupTable(build_table_bytes(snapshot))
+    responses = {"SRSS_E": "Moderate", "Days_missed": "0-5 days"}
+    expected = [iv["support_name"] for iv in snapshot.compiled.match(responses)]
+    assert [table.intervention_names[i] for i in table.lookup(responses)] == expected
+
+
+def test_table_is_rejected_after_a_matcher_change(tmp_path, monkeypatch):
+    snapshot = build_snapshot(SAMPLE)
+    path = str(tmp_path / "sample.lookup.bin")
+    load_or_build(snapshot, path)
+    assert LookupTable.open(path).is_valid_for(snapshot.sha256)
+
+    monkeypatch.setattr(lookup_table, "MATCHER_FINGERPRINT", "changed matcher")
+    assert not LookupTable.open(path).is_valid_for(snapshot.sha256)
+    rebuilt = load_or_build(snapshot, path)
+    assert rebuilt.matcher == "changed matcher"
+    assert rebuilt.is_valid_for(snapshot.sha256)
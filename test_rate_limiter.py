@@ -0,0 +1,51 @@
+import pytest
+
+from rate_limiter import ModelBucket, RateLimiter, is_quota_error
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def _raise(error):
+    def fn():
+        raise error
+    return fn
+
+
+def test_quota_errors_are_recognized():
+    assert is_quota_error(ResourceExhausted("slow down"))
+    assert is_quota_error(RuntimeError("429 Too Many Requests"))
+    assert not is_quota_error(ValueError("bad prompt"))
+
+
+def test_quota_error_is_retried():
+    limiter = RateLimiter({"m": 6000}, base_delay=0.01, max_delay=0.02)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ResourceExhausted("quota")
+        return "reply"
+
+    statuses = []
+    assert limiter.call("m", fn, on_wait=statuses.append) == "reply"
+    assert len(calls) == 3
+    assert len(statuses) == 2
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    limiter = RateLimiter({"m": 6000}, max_retries=1, base_delay=0.01, max_delay=0.02)
+    with pytest.raises(ValueError):
+        limiter.call("m", _raise(ValueError("bad prompt")))
+    with pytest.raises(ResourceExhausted):
+        limiter.call("m", _raise(ResourceExhausted("quota")))
+
+
+def test_empty_bucket_times_out():
+    bucket = ModelBucket(rpm=1, burst=1)
+    bucket.acquire()
+    with pytest.raises(TimeoutError):
+        bucket.acquire(timeout=0.1)
+    assert bucket.stats()["queued"] == 0
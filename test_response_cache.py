@@ -0,0 +1,18 @@
+from response_cache import ResponseCache
+
+
+def test_unusable_cache_directory_falls_back_to_memory():
+    cache = ResponseCache("/proc/nope/x/responses.sqlite3")
+    assert cache.get("k") is None
+    cache.put("k", "reply")
+    assert cache.get("k") == "reply"
+    cache.clear()
+    assert cache.get("k") is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache" / "responses.sqlite3")
+    ResponseCache(path).put("k", "reply")
+    cache = ResponseCache(path)
+    assert cache.get("k") == "reply"
+    assert cache.stats()["disk_hits"] == 1
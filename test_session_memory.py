@@ -0,0 +1,12 @@
+import session_memory
+from session_memory import shared_exchange
+
+
+def test_shared_exchanges_are_bounded_by_size(monkeypatch):
+    monkeypatch.setattr(session_memory, "EXCHANGES_MAX_CHARS", 100)
+    first = shared_exchange("a" * 60, "ok", key="grid-1")
+    assert shared_exchange("a" * 60, "ok", key="grid-1") is first
+    shared_exchange("b" * 60, "ok", key="grid-2")
+    assert "grid-1" not in session_memory._exchanges
+    assert "grid-2" in session_memory._exchanges
+    assert session_memory._exchanges_chars <= 100
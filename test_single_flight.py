@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from single_flight import FlightCancelled, SingleFlight
+
+
+class _Rerun(BaseException):
+    """Stands in for Streamlit's RerunException / StopException."""
+
+
+def test_interrupted_leader_releases_its_flight():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader(flight):
+        started.set()
+        release.wait(5)
+        raise _Rerun()
+
+    def run_leader():
+        with pytest.raises(_Rerun):
+            flights.do("key", leader)
+
+    thread = threading.Thread(target=run_leader)
+    thread.start()
+    assert started.wait(5)
+    flight, is_leader = flights.begin("key")
+    assert not is_leader
+    release.set()
+    thread.join(5)
+
+    with pytest.raises(FlightCancelled):
+        flight.wait(timeout=5)
+    assert flights.stats()["in_flight"] == 0
+    # The key is free again: the next caller leads
+    assert flights.do("key", lambda f: "reply") == ("reply", False)
+
+
+def test_follower_runs_the_request_after_timeout():
+    flights = SingleFlight()
+    stuck, leader = flights.begin("key")
+    assert leader
+    calls = []
+
+    def fn(flight):
+        calls.append(flight)
+        return "own reply"
+
+    assert flights.do("key", fn, wait_timeout=0.05) == ("own reply", False)
+    assert len(calls) == 1 and calls[0] is not stuck
+    flights.finish(stuck, result="late")
+
+
+def test_followers_share_the_leader_result():
+    flights = SingleFlight()
+    flight, _ = flights.begin("key")
+    results = []
+    thread = threading.Thread(target=lambda: results.append(flights.do("key", lambda f: "own")))
+    thread.start()
+    for _ in range(500):
+        if flight.followers:
+            break
+        thread.join(0.01)
+    flights.finish(flight, result="shared")
+    thread.join(5)
+    assert results == [("shared", True)]
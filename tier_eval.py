@@ -0,0 +1,105 @@
+# Concurrent per-tier evaluation of a form submission
+#
+# Each tier is evaluated on its own (a local match or a model request over
+# that tier's grid only) in a small thread pool, and the results are merged
+# into the two-table format instructions.txt mandates. A tier that fails
+# only blanks its own table.
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from grid_matcher import grid_tier, render_tier_tables
+
+# Upper bound on one tier's evaluation, in seconds
+DEFAULT_TIMEOUT = 120.0
+
+TIER_FAILED_NOTE = "Tier {tier} interventions could not be evaluated right now ({error}). Please try again."
+
+_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{2,}")
+_CELL_SPLIT_RE = re.compile(r"(?<!\\)\|")
+
+
+def grids_by_tier(grids: list) -> dict:
+    """
+    {tier: [GridSnapshot, ...]} for the active grids.
+    """
+    tiers = {}
+    for grid in grids:
+        tiers.setdefault(grid_tier(grid.data), []).append(grid)
+    return tiers
+
+
+def tier_prompt(tier: int, form_text: str) -> str:
+    """
+    Request for one tier's table only; the other tier is evaluated separately.
+    """
+    return (form_text + f"\n\nOnly evaluate the Tier {tier} interventions in this grid. Reply with the "
+            f"'# Tier {tier} Interventions' table alone (columns: Intervention | Description), or "
+            f"the sentence stating there are no Tier {tier} interventions.")
+
+
+def _tier_section(reply: str, tier: int) -> str:
+    """
+    The part of a reply under its "Tier N" heading, or the whole reply.
+    """
+    match = re.search(rf"^#+\s*Tier {tier}\b.*$", reply, re.MULTILINE | re.IGNORECASE)
+    if not match:
+        return reply
+    rest = reply[match.end():]
+    following = re.search(r"^#+\s", rest, re.MULTILINE)
+    return rest[:following.start()] if following else rest
+
+
+def parse_table_rows(text: str) -> list:
+    """
+    [{"support_name", "description"}, ...] from the markdown table(s) in `text`.
+    """
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("|") or _SEPARATOR_RE.match(line):
+            continue
+        cells = [c.strip().replace("\\|", "|") for c in _CELL_SPLIT_RE.split(line.strip("|"))]
+        if len(cells) < 2 or cells[0].lower() == "intervention":
+            continue
+        rows.append({"support_name": cells[0], "description": cells[1]})
+    return rows
+
+
+def tier_rows_from_reply(reply: str, tier: int) -> list:
+    return parse_table_rows(_tier_section(reply, tier))
+
+
+def evaluate_tiers(tasks: dict, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Run {tier: callable returning a list of rows} concurrently.
+    Returns ({tier: rows}, {tier: exception}); a tier that raises or times
+    out lands in the second dict without affecting the others.
+    """
+    results, errors = {}, {}
+    if not tasks:
+        return results, errors
+    executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="tier-eval")
+    try:
+        futures = {executor.submit(task): tier for tier, task in tasks.items()}
+        done, pending = wait(futures, timeout=timeout)
+        for future in done:
+            tier = futures[future]
+            try:
+                results[tier] = future.result()
+            except Exception as e:
+                errors[tier] = e
+        for future in pending:
+            future.cancel()
+            errors[futures[future]] = TimeoutError(f"no result within {timeout:.0f}s")
+    finally:
+        # Do not block on a hung request; its thread finishes in the background
+        executor.shutdown(wait=False)
+    return results, errors
+
+
+def merge_tier_results(results: dict, errors: dict) -> str:
+    """
+    Both tiers in the instructions.txt table format; failed tiers get a note.
+    """
+    failed = {tier: TIER_FAILED_NOTE.format(tier=tier, error=error) for tier, error in errors.items()}
+    return render_tier_tables(results, failed)
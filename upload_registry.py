@@ -0,0 +1,87 @@
+# Gemini File API uploads, reused across reruns and sessions
+#
+# Uploads are registered by content hash: the remote file handle is reused
+# until it is close to expiring, and concurrent uploads of the same file wait
+# for a single upload.
+import datetime
+import hashlib
+import io
+import threading
+
+from chat_factory import configured_genai
+
+# The File API keeps uploads for 48 hours; re-upload a little before that
+FILE_TTL = datetime.timedelta(hours=48)
+EXPIRY_MARGIN = datetime.timedelta(minutes=30)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _expires_at(remote_file) -> datetime.datetime:
+    expires = getattr(remote_file, "expiration_time", None)
+    if isinstance(expires, datetime.datetime):
+        return expires if expires.tzinfo else expires.replace(tzinfo=datetime.timezone.utc)
+    return _now() + FILE_TTL
+
+
+class UploadRegistry:
+    def __init__(self, margin: datetime.timedelta = EXPIRY_MARGIN):
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._entries = {}   # sha256 -> (remote file, expires_at)
+        self._key_locks = {}
+        self.uploads = 0
+        self.reuses = 0
+
+    def _fresh(self, sha256: str):
+        entry = self._entries.get(sha256)
+        if entry and entry[1] - self.margin > _now():
+            return entry[0]
+        return None
+
+    def get_or_upload(self, data: bytes, mime_type: str = "application/pdf", display_name: str = None):
+        """
+        Remote file handle for `data`, uploading only if no unexpired upload
+        of the same content exists.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        remote_file = self._fresh(sha256)
+        if remote_file is not None:
+            self.reuses += 1
+            return remote_file
+        with self._lock:
+            key_lock = self._key_locks.setdefault(sha256, threading.Lock())
+        with key_lock:
+            remote_file = self._fresh(sha256)
+            if remote_file is not None:
+                self.reuses += 1
+                return remote_file
+            remote_file = configured_genai().upload_file(
+                io.BytesIO(data), mime_type=mime_type, display_name=display_name
+            )
+            self._entries[sha256] = (remote_file, _expires_at(remote_file))
+            self.uploads += 1
+            return remote_file
+
+    def forget(self, remote_file):
+        """
+        Drop a handle the API rejected (e.g. deleted early) so the next
+        request uploads again.
+        """
+        name = getattr(remote_file, "name", None)
+        with self._lock:
+            for sha256, (entry_file, _) in list(self._entries.items()):
+                if entry_file is remote_file or (name and getattr(entry_file, "name", None) == name):
+                    del self._entries[sha256]
+
+    def stats(self) -> dict:
+        return {"files": len(self._entries), "uploads": self.uploads, "reuses": self.reuses}
+
+
+_registry = UploadRegistry()
+
+
+def get_registry() -> UploadRegistry:
+    return _registry